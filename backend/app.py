@@ -1,12 +1,19 @@
 
 from flask import Flask, jsonify
 from flask_cors import CORS
-from config.database import init_db
+from config.database import init_db, get_connection_pool, log_writer
 from routes.irrigation import irrigation_bp
 from routes.weather import weather_bp
 from routes.mqtt import mqtt_bp
 from routes.logs import logs_bp
 from routes.actors import actors_bp
+from routes.ml import ml_bp
+from services.ml_service import ml_service
+from services.mqtt_service import mqtt_service
+from services.forecast_service import forecast_engine
+from services.retention_service import log_retention
+from services.weather_service import weather_service
+from services.weather_prefetch import weather_prefetcher
 import os
 
 def create_app():
@@ -28,12 +35,28 @@ def create_app():
     # Initialiser DB
     init_db()
     
+    # Connexion MQTT au démarrage du serveur (jamais à l'import du module)
+    mqtt_service.connect()
+    
     # Enregistrer routes
     app.register_blueprint(irrigation_bp, url_prefix='/api')
     app.register_blueprint(weather_bp, url_prefix='/api')
     app.register_blueprint(mqtt_bp, url_prefix='/api')
     app.register_blueprint(logs_bp, url_prefix='/api')
     app.register_blueprint(actors_bp, url_prefix='/api')
+    app.register_blueprint(ml_bp, url_prefix='/api')
+    
+    # Rechargement automatique du modèle si ML_MODEL_WATCH_SECONDS > 0
+    ml_service.start_model_watcher()
+    
+    # Prévisions d'irrigation précalculées pour /api/analytics/ml-predictions
+    forecast_engine.start()
+    
+    # Archivage mensuel des vieux logs si LOG_RETENTION_DAYS > 0
+    log_retention.start()
+    
+    # Météo des localités des acteurs gardée chaude dans le cache
+    weather_prefetcher.start()
     
     @app.route('/api/health', methods=['GET'])
     def health_check():
@@ -41,12 +64,28 @@ def create_app():
             "status": "ok", 
             "message": "Backend Flask LOCAL opérationnel",
             "mode": "development_local",
+            "ml_model": ml_service.get_model_info(),
+            "database": get_connection_pool().stats(),
+            "log_writer": log_writer.stats(),
+            "log_retention": log_retention.stats(),
+            "weather_cache": weather_service.cache_stats(),
+            "weather_api": weather_service.http.stats(),
+            "weather_prefetch": weather_prefetcher.stats(),
             "endpoints": [
                 "/api/arroser", 
+                "/api/arroser/batch",
+                "/api/ml/stats",
+                "/api/ml/reload",
+                "/api/weather?locations=<a,b,c>",
                 "/api/mqtt/test-publish", 
                 "/api/irrigation/status",
                 "/api/actors/register",
-                "/api/actors/list"
+                "/api/actors/list",
+                "/api/actors/import",
+                "/api/actors/bbox",
+                "/api/actors/nearest",
+                "/api/logs/<irrigation|weather|mqtt>/export",
+                "/api/logs/<irrigation|weather|mqtt>/archives"
             ]
         }), 200
     
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la latence d'inférence ML par appel: pipeline pandas vs booster direct vs moteur NumPy
+"""
+
+import os
+import sys
+import time
+import numpy as np
+from services.ml_service import build_booster_layout, features_frame
+from services.tree_engine import CompiledTreeModel, encode_features
+
+MODEL_PATH = os.path.join("models", "xgboost_arrosage_litres.pkl")
+FEATURES = [25, 2.5, 65, 12, 1, 25000, 26, 42, 1.2, 6.8, 45, 38, 152, 3, 2]
+
+def mesurer(label, fonction, iterations):
+    """Exécute la fonction et affiche la latence moyenne et p95 en microsecondes"""
+    for _ in range(min(50, iterations)):
+        fonction()
+    durees = np.empty(iterations)
+    for i in range(iterations):
+        debut = time.perf_counter()
+        fonction()
+        durees[i] = time.perf_counter() - debut
+    print(f"{label:<28} moyenne {durees.mean() * 1e6:9.1f} µs   p95 {np.percentile(durees, 95) * 1e6:9.1f} µs")
+    return durees.mean()
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    if not os.path.exists(MODEL_PATH):
+        print("❌ Modèle non trouvé - lancer depuis backend/")
+        sys.exit(1)
+
+    import joblib
+    model = joblib.load(MODEL_PATH)
+    layout = build_booster_layout(model)
+    ligne = np.asarray(FEATURES, dtype=np.float64).reshape(1, -1)
+    buffer = np.zeros((1, layout["n_columns"]), dtype=np.float32)
+
+    def booster_direct():
+        encoded = encode_features(ligne, layout, out=buffer)
+        return layout["booster"].inplace_predict(encoded, iteration_range=layout["iteration_range"])
+
+    print("=" * 60)
+    print(f"⏱️  Latence par appel ({iterations} itérations, 1 ligne)")
+    print("=" * 60)
+
+    avant = mesurer("Avant: DataFrame + pipeline", lambda: model.predict(features_frame(ligne)), iterations)
+    apres = mesurer("Après: buffer float32", booster_direct, iterations)
+    reference = float(model.predict(features_frame(ligne))[0])
+    print(f"\n🚀 Accélération: x{avant / apres:.1f} - écart de prédiction: {abs(reference - float(booster_direct()[0])):.2e} m³")
+
+    compiled_path = os.path.splitext(MODEL_PATH)[0] + ".npz"
+    if os.path.exists(compiled_path):
+        compiled = CompiledTreeModel.load(compiled_path)
+        numpy_engine = mesurer("Moteur NumPy compilé", lambda: compiled.predict(ligne), iterations)
+        print(f"🌳 Moteur NumPy: x{avant / numpy_engine:.1f} - écart de prédiction: "
+              f"{abs(reference - float(compiled.predict(ligne)[0])):.2e} m³")
@@ -1,10 +1,23 @@
 
 import sqlite3
-from datetime import datetime
+from datetime import datetime, timezone
+import atexit
 import os
+import queue
 import stat
 import tempfile
+import threading
+import time
 from pathlib import Path
+from config.mqtt_config import (
+    DB_POOL_SIZE,
+    DB_BUSY_TIMEOUT_MS,
+    DB_STATEMENT_CACHE_SIZE,
+    LOG_ASYNC_ENABLED,
+    LOG_QUEUE_MAX,
+    LOG_BATCH_SIZE,
+    LOG_FLUSH_INTERVAL_MS
+)
 
 # Utiliser le répertoire home de l'utilisateur pour éviter les problèmes de permissions
 HOME_DIR = Path.home()
@@ -21,14 +34,95 @@ def ensure_db_directory():
         print(f"❌ Erreur création répertoire: {e}")
         return False
 
+class PooledConnection(sqlite3.Connection):
+    """Connexion SQLite longue durée: close() la rend au pool au lieu de la fermer"""
+
+    pool = None
+
+    def close(self):
+        if self.pool is None:
+            return super().close()
+        self.pool.release(self)
+
+    def really_close(self):
+        super().close()
+
+class ConnectionPool:
+    """Pool LIFO de connexions SQLite partagées entre threads
+
+    Chaque connexion est ouverte une seule fois en mode WAL (lecteurs non bloqués
+    par l'écrivain, fsync au checkpoint et non plus à chaque commit) avec un délai
+    d'attente sur verrou et un cache de requêtes préparées.
+    """
+
+    def __init__(self, path, size=DB_POOL_SIZE):
+        self.path = str(path)
+        self.size = size
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._lock = threading.Lock()
+        self.opened = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=DB_BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False,
+            cached_statements=DB_STATEMENT_CACHE_SIZE,
+            factory=PooledConnection
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(DB_BUSY_TIMEOUT_MS)}")
+        conn.pool = self
+        with self._lock:
+            self.opened += 1
+        return conn
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    def release(self, conn):
+        try:
+            # Transaction laissée ouverte par l'appelant (erreur avant commit): annulée
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = sqlite3.Row
+            self._idle.put_nowait(conn)
+        except (queue.Full, sqlite3.Error):
+            conn.really_close()
+
+    def close_all(self):
+        while True:
+            try:
+                self._idle.get_nowait().really_close()
+            except queue.Empty:
+                return
+
+    def stats(self):
+        return {"path": self.path, "size": self.size, "idle": self._idle.qsize(), "opened": self.opened}
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_connection_pool():
+    """Pool de la base courante (recréé si init_db a basculé vers le répertoire temporaire)"""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.path != str(DATABASE_PATH):
+            if _pool is not None:
+                _pool.close_all()
+            elif not ensure_db_directory():
+                raise Exception("Impossible de créer le répertoire de base de données")
+            _pool = ConnectionPool(DATABASE_PATH)
+        return _pool
+
 def get_db_connection():
-    # S'assurer que le répertoire existe
-    if not ensure_db_directory():
-        raise Exception("Impossible de créer le répertoire de base de données")
-    
-    conn = sqlite3.connect(str(DATABASE_PATH))
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Connexion du pool; conn.close() la rend au pool"""
+    return get_connection_pool().acquire()
 
 def ensure_db_permissions():
     """Assurer que la base de données a les bonnes permissions"""
@@ -124,6 +218,139 @@ def init_db():
             )
         ''')
         
+        # Table des prévisions d'irrigation précalculées (acteur × heure)
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS ml_forecasts (
+                actor_id INTEGER NOT NULL,
+                forecast_time DATETIME NOT NULL,
+                volume_m3 REAL,
+                duree_minutes REAL,
+                precipitation REAL,
+                computed_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (actor_id, forecast_time)
+            )
+        ''')
+        
+        # Index des logs: tri (timestamp, id) pour la pagination par curseur, et filtres usuels
+        conn.executescript('''
+            CREATE INDEX IF NOT EXISTS idx_irrigation_logs_timestamp ON irrigation_logs (timestamp, id);
+            CREATE INDEX IF NOT EXISTS idx_irrigation_logs_source ON irrigation_logs (source, timestamp, id);
+            CREATE INDEX IF NOT EXISTS idx_irrigation_logs_action ON irrigation_logs (action, timestamp, id);
+            CREATE INDEX IF NOT EXISTS idx_weather_logs_timestamp ON weather_logs (timestamp, id);
+            CREATE INDEX IF NOT EXISTS idx_weather_logs_location ON weather_logs (location, timestamp, id);
+            CREATE INDEX IF NOT EXISTS idx_mqtt_logs_timestamp ON mqtt_logs (timestamp, id);
+            CREATE INDEX IF NOT EXISTS idx_mqtt_logs_topic ON mqtt_logs (topic, timestamp, id);
+            CREATE INDEX IF NOT EXISTS idx_mqtt_logs_status ON mqtt_logs (status_code, timestamp, id);
+        ''')
+
+        # Agrégats journaliers par source, tenus à jour à chaque insertion d'un log d'irrigation
+        conn.executescript('''
+            CREATE TABLE IF NOT EXISTS irrigation_daily_rollup (
+                day TEXT NOT NULL,
+                source TEXT NOT NULL,
+                count INTEGER NOT NULL DEFAULT 0,
+                volume_count INTEGER NOT NULL DEFAULT 0,
+                volume_sum REAL NOT NULL DEFAULT 0,
+                volume_min REAL,
+                volume_max REAL,
+                duration_sum REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, source)
+            ) WITHOUT ROWID;
+
+            CREATE TRIGGER IF NOT EXISTS trg_irrigation_logs_rollup
+            AFTER INSERT ON irrigation_logs
+            BEGIN
+                INSERT INTO irrigation_daily_rollup
+                    (day, source, count, volume_count, volume_sum, volume_min, volume_max, duration_sum)
+                VALUES (
+                    date(NEW.timestamp), COALESCE(NEW.source, 'manual'), 1,
+                    NEW.volume_m3 IS NOT NULL, COALESCE(NEW.volume_m3, 0), NEW.volume_m3, NEW.volume_m3,
+                    COALESCE(NEW.duration_minutes, 0)
+                )
+                ON CONFLICT (day, source) DO UPDATE SET
+                    count = count + 1,
+                    volume_count = volume_count + excluded.volume_count,
+                    volume_sum = volume_sum + excluded.volume_sum,
+                    volume_min = CASE WHEN volume_min IS NULL OR excluded.volume_min < volume_min
+                                      THEN COALESCE(excluded.volume_min, volume_min) ELSE volume_min END,
+                    volume_max = CASE WHEN volume_max IS NULL OR excluded.volume_max > volume_max
+                                      THEN COALESCE(excluded.volume_max, volume_max) ELSE volume_max END,
+                    duration_sum = duration_sum + excluded.duration_sum;
+            END;
+        ''')
+
+        # Index de la liste des acteurs, et compteur de version pour ETag/Last-Modified
+        conn.executescript('''
+            CREATE INDEX IF NOT EXISTS idx_actors_created ON actors (created_at, id);
+            CREATE INDEX IF NOT EXISTS idx_actors_region ON actors (region, created_at, id);
+            CREATE INDEX IF NOT EXISTS idx_actors_localite ON actors (localite, created_at, id);
+            CREATE INDEX IF NOT EXISTS idx_actors_type_culture ON actors (type_culture, created_at, id);
+            CREATE INDEX IF NOT EXISTS idx_actors_systeme_irrigation ON actors (systeme_irrigation, created_at, id);
+
+            CREATE TABLE IF NOT EXISTS table_versions (
+                name TEXT PRIMARY KEY,
+                version INTEGER NOT NULL DEFAULT 0,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            );
+            INSERT OR IGNORE INTO table_versions (name) VALUES ('actors');
+
+            CREATE TRIGGER IF NOT EXISTS trg_actors_version_insert AFTER INSERT ON actors
+            BEGIN
+                UPDATE table_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE name = 'actors';
+            END;
+            CREATE TRIGGER IF NOT EXISTS trg_actors_version_update AFTER UPDATE ON actors
+            BEGIN
+                UPDATE table_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE name = 'actors';
+            END;
+            CREATE TRIGGER IF NOT EXISTS trg_actors_version_delete AFTER DELETE ON actors
+            BEGIN
+                UPDATE table_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE name = 'actors';
+            END;
+        ''')
+
+        # Index spatial R*Tree des parcelles (acteurs avec coordonnées), tenu à jour par triggers
+        conn.executescript('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS actors_rtree USING rtree (
+                id, min_lat, max_lat, min_lng, max_lng
+            );
+
+            CREATE TRIGGER IF NOT EXISTS trg_actors_rtree_insert AFTER INSERT ON actors
+            WHEN NEW.coordinates_lat IS NOT NULL AND NEW.coordinates_lng IS NOT NULL
+            BEGIN
+                INSERT INTO actors_rtree VALUES (NEW.id, NEW.coordinates_lat, NEW.coordinates_lat,
+                                                 NEW.coordinates_lng, NEW.coordinates_lng);
+            END;
+            CREATE TRIGGER IF NOT EXISTS trg_actors_rtree_update AFTER UPDATE ON actors
+            BEGIN
+                DELETE FROM actors_rtree WHERE id = OLD.id;
+                INSERT INTO actors_rtree
+                SELECT NEW.id, NEW.coordinates_lat, NEW.coordinates_lat, NEW.coordinates_lng, NEW.coordinates_lng
+                WHERE NEW.coordinates_lat IS NOT NULL AND NEW.coordinates_lng IS NOT NULL;
+            END;
+            CREATE TRIGGER IF NOT EXISTS trg_actors_rtree_delete AFTER DELETE ON actors
+            BEGIN
+                DELETE FROM actors_rtree WHERE id = OLD.id;
+            END;
+        ''')
+        if not conn.execute('SELECT 1 FROM actors_rtree LIMIT 1').fetchone():
+            conn.execute('''
+                INSERT INTO actors_rtree
+                SELECT id, coordinates_lat, coordinates_lat, coordinates_lng, coordinates_lng
+                FROM actors WHERE coordinates_lat IS NOT NULL AND coordinates_lng IS NOT NULL
+            ''')
+
+        # Première mise en place: agrégats reconstruits depuis les logs existants
+        if not conn.execute('SELECT 1 FROM irrigation_daily_rollup LIMIT 1').fetchone():
+            conn.execute('''
+                INSERT INTO irrigation_daily_rollup
+                    (day, source, count, volume_count, volume_sum, volume_min, volume_max, duration_sum)
+                SELECT date(timestamp), COALESCE(source, 'manual'), COUNT(*), COUNT(volume_m3),
+                       COALESCE(SUM(volume_m3), 0), MIN(volume_m3), MAX(volume_m3),
+                       COALESCE(SUM(duration_minutes), 0)
+                FROM irrigation_logs
+                GROUP BY date(timestamp), COALESCE(source, 'manual')
+            ''')
+
         conn.commit()
         conn.close()
         print(f"✅ Base de données SQLite initialisée: {DATABASE_PATH}")
@@ -132,38 +359,157 @@ def init_db():
         print(f"❌ Erreur initialisation DB: {e}")
         raise
 
+# Requêtes d'insertion des logs; le timestamp est fixé à la mise en file (UTC, comme CURRENT_TIMESTAMP)
+LOG_INSERTS = {
+    "irrigation": '''
+        INSERT INTO irrigation_logs (action, duration_minutes, volume_m3, mqtt_status, source, details, timestamp)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''',
+    "weather": '''
+        INSERT INTO weather_logs (location, temperature, humidity, wind_speed, precipitation, timestamp)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''',
+    "mqtt": '''
+        INSERT INTO mqtt_logs (topic, message, status_code, timestamp)
+        VALUES (?, ?, ?, ?)
+    '''
+}
+
+def utc_timestamp():
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+class LogWriter:
+    """Écriture des logs en arrière-plan, par lots (group commit)
+
+    Les log_* ne font qu'ajouter la ligne à une file bornée; un thread l'écrit avec
+    executemany dans une seule transaction par lot (LOG_BATCH_SIZE lignes ou
+    LOG_FLUSH_INTERVAL_MS). File pleine: la ligne est abandonnée et comptée, la
+    commande MQTT n'attend jamais le disque. La file est vidée à l'arrêt.
+    """
+
+    def __init__(self, max_queue=LOG_QUEUE_MAX, batch_size=LOG_BATCH_SIZE, flush_interval_ms=LOG_FLUSH_INTERVAL_MS):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stopping = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._counter_lock = threading.Lock()
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.flushes = 0
+        self.last_flush_ms = None
+        self.max_flush_ms = 0.0
+
+    def start(self):
+        with self._start_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def submit(self, kind, params):
+        if not LOG_ASYNC_ENABLED:
+            self._write([(kind, params)])
+            return
+        if self._thread is None or not self._thread.is_alive():
+            self.start()
+        try:
+            self._queue.put_nowait((kind, params))
+            with self._counter_lock:
+                self.enqueued += 1
+        except queue.Full:
+            with self._counter_lock:
+                self.dropped += 1
+                dropped = self.dropped
+            if dropped % 1000 == 1:
+                print(f"⚠️ File des logs pleine: {dropped} ligne(s) abandonnée(s)")
+
+    def _run(self):
+        while not (self._stopping.is_set() and self._queue.empty()):
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            # Regroupe les lignes arrivées pendant l'intervalle, jusqu'à batch_size
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write(self, batch):
+        rows_by_kind = {}
+        for kind, params in batch:
+            rows_by_kind.setdefault(kind, []).append(params)
+
+        started = time.perf_counter()
+        conn = None
+        try:
+            conn = get_db_connection()
+            for kind, rows in rows_by_kind.items():
+                conn.executemany(LOG_INSERTS[kind], rows)
+            conn.commit()
+            self.written += len(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            print(f"❌ Erreur écriture logs ({len(batch)} lignes): {e}")
+        finally:
+            if conn is not None:
+                conn.close()
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.flushes += 1
+        self.last_flush_ms = elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+
+    def flush(self, timeout=5.0):
+        """Attend l'écriture des lignes en file (True si la file est vide à temps)"""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            if self._thread is None or not self._thread.is_alive():
+                return False
+            time.sleep(0.005)
+        return not self._queue.unfinished_tasks
+
+    def stop(self, timeout=5.0):
+        """Vide la file puis arrête le thread (appelé à la sortie du processus)"""
+        self._stopping.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout)
+
+    def stats(self):
+        return {
+            "async": LOG_ASYNC_ENABLED,
+            "queue_depth": self._queue.qsize(),
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "flushes": self.flushes,
+            "last_flush_ms": round(self.last_flush_ms, 2) if self.last_flush_ms is not None else None,
+            "max_flush_ms": round(self.max_flush_ms, 2)
+        }
+
+# Instance globale
+log_writer = LogWriter()
+
 def log_irrigation(action, duration_minutes=None, volume_m3=None, mqtt_status=None, source='manual', details=None):
-    try:
-        conn = get_db_connection()
-        conn.execute('''
-            INSERT INTO irrigation_logs (action, duration_minutes, volume_m3, mqtt_status, source, details)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (action, duration_minutes, volume_m3, mqtt_status, source, details))
-        conn.commit()
-        conn.close()
-    except Exception as e:
-        print(f"❌ Erreur log irrigation: {e}")
+    log_writer.submit("irrigation", (action, duration_minutes, volume_m3, mqtt_status, source, details, utc_timestamp()))
 
 def log_weather(location, temperature, humidity, wind_speed, precipitation):
-    try:
-        conn = get_db_connection()
-        conn.execute('''
-            INSERT INTO weather_logs (location, temperature, humidity, wind_speed, precipitation)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (location, temperature, humidity, wind_speed, precipitation))
-        conn.commit()
-        conn.close()
-    except Exception as e:
-        print(f"❌ Erreur log météo: {e}")
+    log_writer.submit("weather", (location, temperature, humidity, wind_speed, precipitation, utc_timestamp()))
 
 def log_mqtt(topic, message, status_code):
-    try:
-        conn = get_db_connection()
-        conn.execute('''
-            INSERT INTO mqtt_logs (topic, message, status_code)
-            VALUES (?, ?, ?)
-        ''', (topic, message, status_code))
-        conn.commit()
-        conn.close()
-    except Exception as e:
-        print(f"❌ Erreur log MQTT: {e}")
+    log_writer.submit("mqtt", (topic, message, status_code, utc_timestamp()))
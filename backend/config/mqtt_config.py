@@ -22,6 +22,59 @@ MQTT_TOPIC_CONTROL = "data/PulsarInfinite/control" #infinite/PulsarInfinite/cont
 # Paramètres système
 DEBIT_LITRES_PAR_MIN = 20
 MODEL_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'models', 'xgboost_arrosage_litres.pkl')
+ML_FAST_INFERENCE = os.getenv("ML_FAST_INFERENCE", "true").lower() == "true"  # Booster direct, sans pandas
+ML_NUMPY_ENGINE = os.getenv("ML_NUMPY_ENGINE", "true").lower() == "true"  # Modèle compilé .npz (export_model.py) si présent
+ML_MODEL_WATCH_SECONDS = float(os.getenv("ML_MODEL_WATCH_SECONDS", "0"))  # Surveillance du .pkl/.npz (0 = désactivée)
+ML_BATCH_MAX_ROWS = int(os.getenv("ML_BATCH_MAX_ROWS", "1000"))  # Lignes max par appel /api/arroser/batch
+ML_CACHE_SIZE = int(os.getenv("ML_CACHE_SIZE", "2048"))  # Entrées max du cache de prédictions (0 = désactivé)
+ML_CACHE_TTL_SECONDS = float(os.getenv("ML_CACHE_TTL_SECONDS", "300"))
+ML_COALESCE_ENABLED = os.getenv("ML_COALESCE_ENABLED", "false").lower() == "true"  # Regroupement des /api/arroser concurrents
+ML_COALESCE_WINDOW_MS = float(os.getenv("ML_COALESCE_WINDOW_MS", "3"))
+ML_COALESCE_MAX_BATCH = int(os.getenv("ML_COALESCE_MAX_BATCH", "64"))
+ML_PREDICT_TIMEOUT_SECONDS = float(os.getenv("ML_PREDICT_TIMEOUT_SECONDS", "10"))
+ML_INFERENCE_BACKEND = os.getenv("ML_INFERENCE_BACKEND", "thread").lower()  # "thread" ou "process"
+ML_POOL_WORKERS = int(os.getenv("ML_POOL_WORKERS", "2"))
+ML_POOL_MAX_PENDING = int(os.getenv("ML_POOL_MAX_PENDING", "32"))  # Au-delà: refus immédiat (503)
+ML_POOL_START_METHOD = os.getenv("ML_POOL_START_METHOD", "")  # "forkserver", "spawn"... (vide = forkserver, sinon spawn)
+
+# Prévisions d'irrigation précalculées (/api/analytics/ml-predictions)
+FORECAST_HORIZON_HOURS = int(os.getenv("FORECAST_HORIZON_HOURS", "72"))
+FORECAST_REFRESH_SECONDS = float(os.getenv("FORECAST_REFRESH_SECONDS", "900"))
+FORECAST_WEATHER_TTL_SECONDS = float(os.getenv("FORECAST_WEATHER_TTL_SECONDS", "3600"))
+FORECAST_IRRIGATION_THRESHOLD_M3 = float(os.getenv("FORECAST_IRRIGATION_THRESHOLD_M3", "0.5"))
+
+# Base SQLite (pool de connexions WAL)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))  # Connexions gardées ouvertes
+DB_BUSY_TIMEOUT_MS = float(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))  # Attente max sur verrou d'écriture
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "256"))
+LOG_ASYNC_ENABLED = os.getenv("LOG_ASYNC_ENABLED", "true").lower() == "true"  # Logs écrits par lots en arrière-plan
+LOG_QUEUE_MAX = int(os.getenv("LOG_QUEUE_MAX", "10000"))  # Au-delà: lignes abandonnées (comptées)
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "500"))
+LOG_FLUSH_INTERVAL_MS = float(os.getenv("LOG_FLUSH_INTERVAL_MS", "200"))
+LOG_RETENTION_DAYS = int(os.getenv("LOG_RETENTION_DAYS", "0"))  # Logs gardés en base, le reste archivé par mois (0 = désactivé)
+LOG_RETENTION_INTERVAL_SECONDS = float(os.getenv("LOG_RETENTION_INTERVAL_SECONDS", "3600"))
+LOG_RETENTION_BATCH_ROWS = int(os.getenv("LOG_RETENTION_BATCH_ROWS", "2000"))
+
+# Météo
+WEATHER_CACHE_TTL_SECONDS = float(os.getenv("WEATHER_CACHE_TTL_SECONDS", "300"))  # Donnée fraîche par localité
+WEATHER_STALE_SECONDS = float(os.getenv("WEATHER_STALE_SECONDS", "3600"))  # Servie périmée (rafraîchie en fond) jusqu'à cet âge
+WEATHER_SINGLEFLIGHT_TIMEOUT_SECONDS = float(os.getenv("WEATHER_SINGLEFLIGHT_TIMEOUT_SECONDS", "15"))  # Attente max d'un appel API déjà en cours
+WEATHER_HTTP_POOL_SIZE = int(os.getenv("WEATHER_HTTP_POOL_SIZE", "10"))  # Connexions keep-alive vers OpenWeather
+WEATHER_HTTP_TIMEOUT_SECONDS = float(os.getenv("WEATHER_HTTP_TIMEOUT_SECONDS", "10"))
+WEATHER_HTTP_RETRIES = int(os.getenv("WEATHER_HTTP_RETRIES", "2"))  # Essais supplémentaires (réseau, 429, 5xx)
+WEATHER_HTTP_BACKOFF_SECONDS = float(os.getenv("WEATHER_HTTP_BACKOFF_SECONDS", "0.3"))  # Base du backoff exponentiel (jitter)
+WEATHER_BREAKER_THRESHOLD = int(os.getenv("WEATHER_BREAKER_THRESHOLD", "5"))  # Échecs consécutifs avant ouverture
+WEATHER_BREAKER_RESET_SECONDS = float(os.getenv("WEATHER_BREAKER_RESET_SECONDS", "60"))  # Délai avant un appel d'essai
+WEATHER_BATCH_MAX_LOCATIONS = int(os.getenv("WEATHER_BATCH_MAX_LOCATIONS", "50"))  # Localités max par /api/weather?locations=
+WEATHER_BATCH_CONCURRENCY = int(os.getenv("WEATHER_BATCH_CONCURRENCY", "8"))  # Appels API simultanés pour les localités hors cache
+WEATHER_PREFETCH_ENABLED = os.getenv("WEATHER_PREFETCH_ENABLED", "true").lower() == "true"  # Météo des localités des acteurs rafraîchie en fond
+WEATHER_PREFETCH_INTERVAL_SECONDS = float(os.getenv("WEATHER_PREFETCH_INTERVAL_SECONDS", str(WEATHER_CACHE_TTL_SECONDS * 0.8)))  # Avant expiration du cache
+WEATHER_PREFETCH_CONCURRENCY = int(os.getenv("WEATHER_PREFETCH_CONCURRENCY", "4"))  # Appels API simultanés max
+WEATHER_PREFETCH_MAX_LOCATIONS = int(os.getenv("WEATHER_PREFETCH_MAX_LOCATIONS", "200"))  # Protège le quota OpenWeather
+
+# Acteurs
+ACTORS_IMPORT_MAX_ROWS = int(os.getenv("ACTORS_IMPORT_MAX_ROWS", "20000"))  # Lignes max par /api/actors/import
 
 # Clés API
 OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY", "votre_cle_api_openweather")
+OPENWEATHER_BASE_URL = os.getenv("OPENWEATHER_BASE_URL", "http://api.openweathermap.org/data/2.5")
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Export du modèle XGBoost (.pkl) en tableaux NumPy (.npz) pour le moteur d'inférence léger
+
+Le fichier n'est écrit que si ses prédictions sont identiques à celles du modèle d'origine.
+"""
+
+import os
+import sys
+import numpy as np
+from services.ml_service import (
+    FEATURE_COLUMNS,
+    CATEGORY_CODES,
+    build_booster_layout,
+    features_frame
+)
+from services.tree_engine import CompiledTreeModel, compile_booster, save_compiled_model, file_sha256
+
+MODEL_PATH = os.path.join("models", "xgboost_arrosage_litres.pkl")
+TOLERANCE_M3 = 1e-5
+
+# Plages réalistes des 15 features (Thiès / Taïba Ndiaye) pour le contrôle de parité
+FEATURE_RANGES = [
+    (15, 45), (0, 40), (15, 100), (0, 40), None, (100, 50000), (15, 45), (5, 90),
+    (0.1, 4), (4.5, 8.5), (5, 120), (5, 90), (40, 300), (1, 5), None
+]
+
+def parity_matrix(layout, rows=5000, seed=42):
+    """Features aléatoires + lignes placées exactement sur les seuils des arbres"""
+    rng = np.random.default_rng(seed)
+    matrix = np.empty((rows, len(FEATURE_COLUMNS)))
+    for index, bounds in enumerate(FEATURE_RANGES):
+        if bounds is None:
+            # Codes connus du modèle, plus des codes inconnus (ignorés par l'encodeur)
+            codes = list(CATEGORY_CODES[FEATURE_COLUMNS[index]]) + [0, 9]
+            matrix[:, index] = rng.choice(codes, size=rows)
+        else:
+            matrix[:, index] = rng.uniform(*bounds, size=rows)
+    return matrix
+
+def threshold_rows(compiled, base_row):
+    """Une ligne par seuil numérique: x == seuil teste le sens de la comparaison"""
+    source_by_column = dict(zip(compiled.layout["numeric_dst"], compiled.layout["numeric_src"]))
+    rows = []
+    for feature, threshold in zip(compiled.feature, compiled.threshold):
+        if feature in source_by_column:
+            row = base_row.copy()
+            row[source_by_column[feature]] = threshold
+            rows.append(row)
+    return np.array(rows) if rows else np.empty((0, len(base_row)))
+
+def check_parity(model, compiled, matrix):
+    """Écart maximal (m³) entre le pipeline d'origine et le moteur NumPy"""
+    expected = np.asarray(model.predict(features_frame(matrix)), dtype=np.float64)
+    actual = compiled.predict(matrix).astype(np.float64)
+    return float(np.max(np.abs(expected - actual))) if len(matrix) else 0.0
+
+if __name__ == "__main__":
+    model_path = sys.argv[1] if len(sys.argv) > 1 else MODEL_PATH
+    output_path = os.path.splitext(model_path)[0] + ".npz"
+    tmp_path = output_path + ".tmp.npz"
+
+    import joblib
+
+    print("=" * 60)
+    print(f"📦 Export du modèle: {model_path}")
+    print("=" * 60)
+
+    model = joblib.load(model_path)
+    layout = build_booster_layout(model)
+    trees = compile_booster(layout["booster"], tree_limit=layout["iteration_range"][1])
+    save_compiled_model(tmp_path, trees, layout, FEATURE_COLUMNS, file_sha256(model_path))
+    compiled = CompiledTreeModel.load(tmp_path)
+    print(f"🌳 {compiled.n_trees} arbres, {len(compiled.feature)} noeuds, profondeur max {compiled.max_depth}")
+
+    matrix = parity_matrix(layout)
+    edges = threshold_rows(compiled, matrix[0])
+    ecart = max(check_parity(model, compiled, matrix), check_parity(model, compiled, edges))
+    print(f"🔍 Parité sur {len(matrix) + len(edges)} lignes: écart max {ecart:.2e} m³")
+
+    if ecart > TOLERANCE_M3:
+        os.remove(tmp_path)
+        print(f"❌ Écart supérieur à {TOLERANCE_M3:.0e} m³ - export annulé")
+        sys.exit(1)
+
+    os.replace(tmp_path, output_path)
+    print(f"✅ Modèle compilé écrit: {output_path}")
+    print("=" * 60)
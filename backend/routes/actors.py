@@ -1,12 +1,24 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, make_response
 from config.database import get_db_connection, ensure_db_permissions
+from services.forecast_service import forecast_engine
+from services.feature_service import feature_assembler
+from config.mqtt_config import ACTORS_IMPORT_MAX_ROWS
+import base64
+import csv
+import hashlib
+import io
 import json
 import logging
+import math
 import sqlite3
 import os
+from datetime import datetime, timezone
 
 actors_bp = Blueprint('actors', __name__)
 
+ACTOR_REQUIRED_FIELDS = ['prenom', 'nom', 'role', 'region', 'localite', 
+                         'superficie', 'systeme_irrigation', 'type_sol', 'type_culture', 'speculation']
+
 @actors_bp.route('/actors/register', methods=['POST'])
 def register_actor():
     """Enregistrer un nouvel acteur agricole"""
@@ -14,10 +26,7 @@ def register_actor():
         data = request.get_json()
         
         # Validation des données requises
-        required_fields = ['prenom', 'nom', 'role', 'region', 'localite', 
-                          'superficie', 'systeme_irrigation', 'type_sol', 'type_culture', 'speculation']
-        
-        for field in required_fields:
+        for field in ACTOR_REQUIRED_FIELDS:
             if not data.get(field):
                 return jsonify({"error": f"Champ requis manquant: {field}"}), 400
         
@@ -71,6 +80,7 @@ def register_actor():
         actor_id = cursor.lastrowid
         conn.commit()
         conn.close()
+        forecast_engine.notify_actors_changed()
         
         print(f"✅ Nouvel acteur enregistré: {data['prenom']} {data['nom']} (ID: {actor_id})")
         
@@ -112,6 +122,145 @@ def register_actor():
             "solution": "Vérifiez les logs du serveur Flask"
         }), 500
 
+def parse_import_rows():
+    """Lignes d'import: tableau JSON ({"actors": [...]} accepté) ou CSV (corps ou fichier "file")"""
+    if request.is_json:
+        data = request.get_json(silent=True)
+        if data is None:
+            raise ValueError("JSON invalide")
+        rows = data.get("actors") if isinstance(data, dict) else data
+        if not isinstance(rows, list):
+            raise ValueError("Tableau JSON d'acteurs attendu")
+        return rows
+    
+    upload = request.files.get("file")
+    text = upload.read().decode("utf-8-sig") if upload else request.get_data(as_text=True)
+    if not text.strip():
+        raise ValueError("Corps vide: JSON ou CSV attendu")
+    return list(csv.DictReader(io.StringIO(text)))
+
+def validate_import_row(row):
+    """Valide une ligne d'import; retourne (paramètres SQL, liste d'erreurs)"""
+    if not isinstance(row, dict):
+        return None, ["Objet acteur attendu"]
+    
+    errors = [f"Champ requis manquant: {field}" for field in ACTOR_REQUIRED_FIELDS
+              if not str(row.get(field) or "").strip()]
+    
+    # Coordonnées: {"coordinates": {"lat", "lng"}} en JSON, colonnes lat/lng en CSV
+    coordinates = row.get('coordinates') if isinstance(row.get('coordinates'), dict) else {}
+    lat = coordinates.get('lat', row.get('lat', row.get('coordinates_lat')))
+    lng = coordinates.get('lng', row.get('lng', row.get('coordinates_lng')))
+    values = {}
+    for name, value, cast in (('id', row.get('id'), int), ('superficie', row.get('superficie'), int),
+                              ('lat', lat, float), ('lng', lng, float)):
+        if value in (None, ""):
+            values[name] = None
+            continue
+        try:
+            values[name] = cast(float(value)) if cast is int else cast(value)
+        except (TypeError, ValueError):
+            errors.append(f"Valeur invalide pour {name}: {value}")
+    
+    if errors:
+        return None, errors
+    
+    return (
+        str(row['prenom']).strip(), str(row['nom']).strip(), str(row['role']).strip(),
+        str(row['region']).strip(), str(row['localite']).strip(), values['superficie'],
+        str(row['systeme_irrigation']).strip(), str(row['type_sol']).strip(),
+        str(row['type_culture']).strip(), str(row['speculation']).strip(),
+        values['lat'], values['lng'], values['id']
+    ), []
+
+@actors_bp.route('/actors/import', methods=['POST'])
+def import_actors():
+    """Import en masse d'acteurs (JSON ou CSV), en une transaction
+
+    Une ligne avec un "id" existant met à jour l'acteur, sinon elle est insérée.
+    ?atomic=true: rien n'est écrit si une ligne est invalide.
+    """
+    try:
+        try:
+            rows = parse_import_rows()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        if len(rows) > ACTORS_IMPORT_MAX_ROWS:
+            return jsonify({"error": f"Maximum {ACTORS_IMPORT_MAX_ROWS} acteurs par import"}), 400
+        
+        valid, errors = [], []
+        seen_ids = set()
+        for index, row in enumerate(rows):
+            params, row_errors = validate_import_row(row)
+            if not row_errors and params[-1] is not None:
+                if params[-1] in seen_ids:
+                    row_errors = [f"id {params[-1]} en double dans l'import"]
+                seen_ids.add(params[-1])
+            if row_errors:
+                errors.append({"index": index, "errors": row_errors})
+            else:
+                valid.append(params)
+        
+        if errors and (not valid or request.args.get("atomic", "false").lower() == "true"):
+            return jsonify({
+                "success": False,
+                "message": "Aucun acteur importé",
+                "inserted": 0,
+                "updated": 0,
+                "failed": len(errors),
+                "errors": errors
+            }), 400
+        
+        conn = get_db_connection()
+        try:
+            requested_ids = [params[-1] for params in valid if params[-1] is not None]
+            existing = set()
+            for start in range(0, len(requested_ids), 500):
+                chunk = requested_ids[start:start + 500]
+                existing.update(row[0] for row in conn.execute(
+                    f"SELECT id FROM actors WHERE id IN ({','.join('?' * len(chunk))})", chunk
+                ))
+            updates = [params for params in valid if params[-1] in existing]
+            inserts = [params for params in valid if params[-1] not in existing]
+            
+            conn.executemany('''
+                INSERT INTO actors (prenom, nom, role, region, localite, superficie, 
+                                  systeme_irrigation, type_sol, type_culture, speculation,
+                                  coordinates_lat, coordinates_lng, id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', inserts)
+            conn.executemany('''
+                UPDATE actors SET
+                    prenom = ?, nom = ?, role = ?, region = ?, localite = ?,
+                    superficie = ?, systeme_irrigation = ?, type_sol = ?,
+                    type_culture = ?, speculation = ?, coordinates_lat = ?,
+                    coordinates_lng = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', updates)
+            conn.commit()
+        finally:
+            conn.close()
+        
+        forecast_engine.notify_actors_changed()
+        if updates:
+            feature_assembler.invalidate()
+        
+        print(f"✅ Import acteurs: {len(inserts)} ajouté(s), {len(updates)} mis à jour, {len(errors)} rejeté(s)")
+        
+        return jsonify({
+            "success": True,
+            "message": "Import terminé",
+            "inserted": len(inserts),
+            "updated": len(updates),
+            "failed": len(errors),
+            "errors": errors
+        }), 200
+        
+    except Exception as e:
+        logging.error(f"❌ Erreur import acteurs: {e}")
+        return jsonify({"error": "Erreur interne du serveur"}), 500
+
 @actors_bp.route('/actors/<int:actor_id>', methods=['PUT'])
 def update_actor(actor_id):
     """Modifier un acteur existant"""
@@ -152,6 +301,8 @@ def update_actor(actor_id):
         
         conn.commit()
         conn.close()
+        forecast_engine.notify_actors_changed()
+        feature_assembler.invalidate(actor_id)
         
         logging.info(f"✅ Acteur modifié: {data['prenom']} {data['nom']} (ID: {actor_id})")
         
@@ -182,6 +333,8 @@ def delete_actor(actor_id):
         conn.execute('DELETE FROM actors WHERE id = ?', (actor_id,))
         conn.commit()
         conn.close()
+        forecast_engine.notify_actors_changed()
+        feature_assembler.invalidate(actor_id)
         
         logging.info(f"✅ Acteur supprimé: {actor[0]} {actor[1]} (ID: {actor_id})")
         
@@ -194,33 +347,85 @@ def delete_actor(actor_id):
         logging.error(f"❌ Erreur suppression acteur: {e}")
         return jsonify({"error": "Erreur interne du serveur"}), 500
 
+ACTOR_FILTERS = ("region", "localite", "type_culture", "systeme_irrigation")
+MAX_ACTORS_LIMIT = 500
+
+def actors_version(conn):
+    """Version de la table actors (incrémentée par trigger à chaque écriture)"""
+    row = conn.execute("SELECT version, updated_at FROM table_versions WHERE name = 'actors'").fetchone()
+    return (row["version"], row["updated_at"]) if row else (0, None)
+
+def encode_actor_cursor(row):
+    return base64.urlsafe_b64encode(f"{row['created_at']}|{row['id']}".encode()).decode()
+
+def decode_actor_cursor(cursor):
+    created_at, actor_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 1)
+    return created_at, int(actor_id)
+
 @actors_bp.route('/actors/list', methods=['GET'])
 def list_actors():
-    """Récupérer la liste de tous les acteurs enregistrés"""
+    """Récupérer la liste des acteurs (?limit, cursor, region, localite, type_culture, systeme_irrigation)
+
+    Sans paramètre: tous les acteurs, comme avant. L'ETag suit la version de la table:
+    une liste inchangée coûte un 304 sans requête sur les acteurs.
+    """
     try:
-        conn = get_db_connection()
+        limit = request.args.get('limit', type=int)
+        if limit is not None and limit < 1:
+            return jsonify({"error": "limit doit être un entier positif"}), 400
         
-        # Vérifier si la table existe
-        cursor = conn.execute('''
-            SELECT name FROM sqlite_master 
-            WHERE type='table' AND name='actors'
-        ''')
-        
-        if not cursor.fetchone():
+        conn = get_db_connection()
+        try:
+            version, updated_at = actors_version(conn)
+            query_hash = hashlib.sha1(request.query_string).hexdigest()[:12]
+            etag = f"actors-{version}-{query_hash}"
+            last_modified = datetime.strptime(updated_at, '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc) if updated_at else None
+            
+            # 304 sur l'ETag seul: Last-Modified est à la seconde près, If-Modified-Since
+            # raterait un acteur ajouté dans la même seconde qu'une lecture précédente
+            if request.if_none_match.contains(etag):
+                response = make_response('', 304)
+                response.set_etag(etag)
+                return response
+            
+            conditions, params = [], []
+            for field in ACTOR_FILTERS:
+                value = request.args.get(field)
+                if value is not None:
+                    conditions.append(f"{field} = ?")
+                    params.append(value)
+            where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+            total = conn.execute(f'SELECT COUNT(*) FROM actors {where}', params).fetchone()[0]
+            
+            if request.args.get('cursor'):
+                try:
+                    conditions.append("(created_at, id) < (?, ?)")
+                    params.extend(decode_actor_cursor(request.args['cursor']))
+                except Exception:
+                    return jsonify({"error": "Curseur invalide"}), 400
+                where = f"WHERE {' AND '.join(conditions)}"
+            
+            page_limit = min(limit, MAX_ACTORS_LIMIT) if limit else None
+            cursor = conn.execute(f'''
+                SELECT id, prenom, nom, role, region, localite, superficie,
+                       systeme_irrigation, type_sol, type_culture, speculation, 
+                       coordinates_lat, coordinates_lng, created_at
+                FROM actors 
+                {where}
+                ORDER BY created_at DESC, id DESC
+                LIMIT ?
+            ''', params + [page_limit + 1 if page_limit else -1])
+            rows = cursor.fetchall()
+        finally:
             conn.close()
-            return jsonify({"actors": []}), 200
         
-        # Récupérer tous les acteurs
-        cursor = conn.execute('''
-            SELECT id, prenom, nom, role, region, localite, superficie,
-                   systeme_irrigation, type_sol, type_culture, speculation, 
-                   coordinates_lat, coordinates_lng, created_at
-            FROM actors 
-            ORDER BY created_at DESC
-        ''')
+        next_cursor = None
+        if page_limit and len(rows) > page_limit:
+            rows = rows[:page_limit]
+            next_cursor = encode_actor_cursor(rows[-1])
         
         actors = []
-        for row in cursor.fetchall():
+        for row in rows:
             actor = {
                 "id": row[0],
                 "prenom": row[1],
@@ -245,15 +450,22 @@ def list_actors():
             
             actors.append(actor)
         
-        conn.close()
-        
         logging.info(f"📋 Liste acteurs récupérée: {len(actors)} acteur(s)")
         
-        return jsonify({
+        body = {
             "success": True,
             "actors": actors,
-            "total": len(actors)
-        }), 200
+            "total": total
+        }
+        if limit:
+            body["next_cursor"] = next_cursor
+        
+        response = make_response(jsonify(body), 200)
+        response.set_etag(etag)
+        if last_modified:
+            response.last_modified = last_modified
+        response.headers["Cache-Control"] = "no-cache"  # Toujours revalider (304 si inchangé)
+        return response
         
     except Exception as e:
         logging.error(f"❌ Erreur récupération acteurs: {e}")
@@ -311,3 +523,145 @@ def get_actor(actor_id):
     except Exception as e:
         logging.error(f"❌ Erreur récupération acteur {actor_id}: {e}")
         return jsonify({"error": "Erreur interne du serveur"}), 500
+
+ACTOR_COLUMNS = '''
+    a.id, a.prenom, a.nom, a.role, a.region, a.localite, a.superficie,
+    a.systeme_irrigation, a.type_sol, a.type_culture, a.speculation,
+    a.coordinates_lat, a.coordinates_lng, a.created_at
+'''
+MAX_SPATIAL_RESULTS = 5000
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.32
+
+def actor_from_row(row):
+    """Même format que /actors/list (colonnes ACTOR_COLUMNS)"""
+    return {
+        "id": row["id"],
+        "prenom": row["prenom"],
+        "nom": row["nom"],
+        "role": row["role"],
+        "region": row["region"],
+        "localite": row["localite"],
+        "superficie": row["superficie"],
+        "systeme_irrigation": row["systeme_irrigation"],
+        "type_sol": row["type_sol"],
+        "type_culture": row["type_culture"],
+        "speculation": row["speculation"],
+        "created_at": row["created_at"],
+        "coordinates": {"lat": row["coordinates_lat"], "lng": row["coordinates_lng"]}
+    }
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+def required_float(name):
+    value = request.args.get(name, type=float)
+    if value is None:
+        raise ValueError(f"Paramètre numérique requis: {name}")
+    return value
+
+@actors_bp.route('/actors/bbox', methods=['GET'])
+def actors_in_bbox():
+    """Acteurs dont la parcelle est dans un rectangle (?min_lat, max_lat, min_lng, max_lng, limit)"""
+    try:
+        try:
+            bounds = [required_float(name) for name in ("min_lat", "max_lat", "min_lng", "max_lng")]
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        limit = min(request.args.get('limit', 1000, type=int) or 1000, MAX_SPATIAL_RESULTS)
+        
+        conn = get_db_connection()
+        try:
+            rows = conn.execute(f'''
+                SELECT {ACTOR_COLUMNS}
+                FROM actors_rtree r JOIN actors a ON a.id = r.id
+                WHERE r.max_lat >= ? AND r.min_lat <= ? AND r.max_lng >= ? AND r.min_lng <= ?
+                  AND a.coordinates_lat BETWEEN ? AND ? AND a.coordinates_lng BETWEEN ? AND ?
+                LIMIT ?
+            ''', bounds + bounds + [limit + 1]).fetchall()
+        finally:
+            conn.close()
+        
+        return jsonify({
+            "success": True,
+            "actors": [actor_from_row(row) for row in rows[:limit]],
+            "total": min(len(rows), limit),
+            "truncated": len(rows) > limit
+        }), 200
+        
+    except Exception as e:
+        logging.error(f"❌ Erreur recherche spatiale acteurs: {e}")
+        return jsonify({"error": "Erreur interne du serveur"}), 500
+
+@actors_bp.route('/actors/nearest', methods=['GET'])
+def nearest_actors():
+    """Les k acteurs les plus proches d'un point (?lat, lng, k=10, max_km)
+
+    Recherche dans un carré autour du point via le R*Tree, agrandi jusqu'à trouver
+    k parcelles à l'intérieur du rayon couvert.
+    """
+    try:
+        try:
+            lat, lng = required_float("lat"), required_float("lng")
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        k = max(1, min(request.args.get('k', 10, type=int) or 10, MAX_SPATIAL_RESULTS))
+        max_km = request.args.get('max_km', type=float)
+        
+        conn = get_db_connection()
+        try:
+            indexed = conn.execute('SELECT COUNT(*) FROM actors_rtree').fetchone()[0]
+            radius_km = 1.0
+            while True:
+                if max_km is not None:
+                    radius_km = min(radius_km, max_km)
+                delta_lat = radius_km / KM_PER_DEGREE
+                delta_lng = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+                # Coordonnées exactes lues dans actors (le R*Tree les stocke en float32)
+                points = conn.execute('''
+                    SELECT a.id, a.coordinates_lat, a.coordinates_lng
+                    FROM actors_rtree r JOIN actors a ON a.id = r.id
+                    WHERE r.max_lat >= ? AND r.min_lat <= ? AND r.max_lng >= ? AND r.min_lng <= ?
+                ''', (lat - delta_lat, lat + delta_lat, lng - delta_lng, lng + delta_lng)).fetchall()
+                
+                candidates = sorted(
+                    (haversine_km(lat, lng, point_lat, point_lng), actor_id)
+                    for actor_id, point_lat, point_lng in points
+                )
+                # Seules les distances <= rayon sont sûres: un point hors du carré peut être plus proche qu'un coin
+                within = [candidate for candidate in candidates if candidate[0] <= radius_km]
+                if len(within) >= k or len(points) >= indexed or radius_km >= 20000 or radius_km == max_km:
+                    break
+                radius_km *= 4
+            
+            nearest = within if len(within) >= k or radius_km == max_km else candidates
+            if max_km is not None:
+                # Tous les points lus avant d'atteindre max_km: la limite reste celle de l'appelant
+                nearest = [candidate for candidate in nearest if candidate[0] <= max_km]
+            nearest = nearest[:k]
+            rows = {
+                row["id"]: row for row in conn.execute(
+                    f'SELECT {ACTOR_COLUMNS} FROM actors a WHERE a.id IN ({",".join("?" * len(nearest))})',
+                    [actor_id for _, actor_id in nearest]
+                )
+            } if nearest else {}
+        finally:
+            conn.close()
+        
+        actors = []
+        for distance, actor_id in nearest:
+            actor = actor_from_row(rows[actor_id])
+            actor["distance_km"] = round(distance, 3)
+            actors.append(actor)
+        
+        return jsonify({
+            "success": True,
+            "actors": actors,
+            "total": len(actors)
+        }), 200
+        
+    except Exception as e:
+        logging.error(f"❌ Erreur recherche acteurs proches: {e}")
+        return jsonify({"error": "Erreur interne du serveur"}), 500
@@ -1,11 +1,14 @@
 from flask import Blueprint, request, jsonify
 from services.mqtt_service import mqtt_service
-from services.ml_service import ml_service
+from services.ml_pool import ml_inference, InferenceBusyError, InferenceTimeoutError
+from services.ml_coalescer import ml_coalescer
+from services.forecast_service import forecast_engine
+from services.feature_service import feature_assembler
 from config.database import log_irrigation, get_db_connection
+from config.mqtt_config import ML_BATCH_MAX_ROWS
 import threading
 import time
 import sqlite3
-from datetime import datetime, timedelta
 
 irrigation_bp = Blueprint("irrigation", __name__)
 
@@ -205,11 +208,27 @@ def arroser_ml():
             }), 400
             
         features = data.get("features", [])
+        actor_id = data.get("actor_id")
+        
+        if not features and actor_id is not None:
+            # Features assemblées côté serveur: acteur + météo courante + sol (défauts ou "soil")
+            try:
+                features = feature_assembler.build(int(actor_id), data.get("soil"))
+            except (TypeError, ValueError) as feature_error:
+                return jsonify({
+                    "status": "error",
+                    "message": f"Paramètres invalides: {str(feature_error)}"
+                }), 400
+            if features is None:
+                return jsonify({
+                    "status": "error",
+                    "message": f"Acteur {actor_id} non trouvé"
+                }), 404
         
         if not features or len(features) != 15:
             return jsonify({
                 "status": "error",
-                "message": "15 features requises pour le modèle ML"
+                "message": "15 features (ou actor_id) requises pour le modèle ML"
             }), 400
         
         # Vérification sécurisée AVANT nettoyage automatique
@@ -241,7 +260,13 @@ def arroser_ml():
         
         # Prédiction ML
         try:
-            prediction = ml_service.predict_irrigation(features)
+            prediction = (ml_coalescer or ml_inference).predict_irrigation(features)
+        except (InferenceBusyError, InferenceTimeoutError) as busy_error:
+            print(f"⚠️ Inférence ML indisponible: {busy_error}")
+            return jsonify({
+                "status": "error",
+                "message": f"Service ML surchargé, réessayez: {str(busy_error)}"
+            }), 503
         except Exception as ml_error:
             print(f"❌ Erreur ML: {ml_error}")
             return jsonify({
@@ -263,6 +288,7 @@ def arroser_ml():
             "status": "ok",
             "duree_minutes": prediction["duree_minutes"],
             "volume_eau_m3": prediction["volume_m3"],
+            "features": features,
             "matt": f"Prédiction ML: {prediction['duree_minutes']:.1f} min - {prediction['volume_litres']:.0f}L (VALIDATION ADMIN OBLIGATOIRE)",
             "mqtt_started": False,  # SÉCURITÉ: TOUJOURS False
             "auto_irrigation": False,  # SÉCURITÉ: TOUJOURS False
@@ -278,6 +304,85 @@ def arroser_ml():
             "message": f"Erreur serveur ML: {str(e)}"
         }), 500
 
+@irrigation_bp.route("/arroser/batch", methods=["POST"])
+def arroser_ml_batch():
+    """Prédictions ML pour plusieurs parcelles en un appel - SANS déclenchement automatique"""
+    try:
+        data = request.get_json(silent=True)
+        
+        if not isinstance(data, dict) or not data:
+            return jsonify({
+                "status": "error",
+                "message": "Objet JSON requis: {\"features\": [[...15 valeurs], ...]}"
+            }), 400
+            
+        features_rows = data.get("features", [])
+        
+        if not isinstance(features_rows, list) or not features_rows:
+            return jsonify({
+                "status": "error",
+                "message": "Liste de vecteurs de 15 features requise"
+            }), 400
+        
+        if len(features_rows) > ML_BATCH_MAX_ROWS:
+            return jsonify({
+                "status": "error",
+                "message": f"Maximum {ML_BATCH_MAX_ROWS} parcelles par requête, reçu: {len(features_rows)}"
+            }), 400
+        
+        print(f"🤖 Début prédiction ML batch: {len(features_rows)} parcelles...")
+        
+        try:
+            predictions = ml_inference.predict_irrigation_batch(features_rows)
+        except (InferenceBusyError, InferenceTimeoutError) as busy_error:
+            print(f"⚠️ Inférence ML indisponible: {busy_error}")
+            return jsonify({
+                "status": "error",
+                "message": f"Service ML surchargé, réessayez: {str(busy_error)}"
+            }), 503
+        except Exception as ml_error:
+            print(f"❌ Erreur ML batch: {ml_error}")
+            return jsonify({
+                "status": "error",
+                "message": f"Erreur modèle ML: {str(ml_error)}"
+            }), 500
+        
+        results = []
+        for prediction in predictions:
+            if prediction["status"] != "ok":
+                results.append(prediction)
+                continue
+            results.append({
+                "index": prediction["index"],
+                "status": "ok",
+                "duree_minutes": prediction["duree_minutes"],
+                "duree_sec": prediction["duree_sec"],
+                "volume_eau_m3": prediction["volume_m3"],
+                "volume_litres": prediction["volume_litres"]
+            })
+        
+        succeeded = sum(1 for r in results if r["status"] == "ok")
+        
+        # SÉCURITÉ: comme /arroser, aucune irrigation n'est déclenchée ici
+        return jsonify({
+            "status": "ok",
+            "count": len(results),
+            "succeeded": succeeded,
+            "failed": len(results) - succeeded,
+            "results": results,
+            "mqtt_started": False,
+            "auto_irrigation": False,
+            "requires_admin_validation": True,
+            "no_auto_start": True
+        }), 200
+        
+    except Exception as e:
+        print(f"❌ Erreur ML arrosage batch: {e}")
+        return jsonify({
+            "status": "error",
+            "message": f"Erreur serveur ML: {str(e)}"
+        }), 500
+
 @irrigation_bp.route("/irrigation/ml-start", methods=["POST"])
 def start_ml_irrigation():
     """Démarre l'irrigation ML AVEC validation admin explicite"""
@@ -356,38 +461,34 @@ def start_ml_irrigation():
 
 @irrigation_bp.route("/irrigation/analysis", methods=["GET"])
 def get_irrigation_analysis():
-    """Retourne l'analyse des données min/max d'irrigation"""
+    """Retourne l'analyse des données min/max d'irrigation (?days=30, depuis les agrégats journaliers)"""
     try:
-        conn = get_db_connection()
+        days = request.args.get("days", 30, type=int)
+        if days is None or not 1 <= days <= 3650:
+            return jsonify({"status": "error", "message": "days doit être entre 1 et 3650"}), 400
         
-        # Récupérer les données des 30 derniers jours
-        thirty_days_ago = datetime.now() - timedelta(days=30)
+        conn = get_db_connection()
         
-        # Analyse pour irrigation manuelle
-        manual_query = '''
+        # Une ligne par jour et par source: coût indépendant du nombre de logs
+        rows = conn.execute('''
             SELECT 
-                MAX(volume_m3) as max_volume,
-                MIN(volume_m3) as min_volume,
-                AVG(volume_m3) as current_volume
-            FROM irrigation_logs 
-            WHERE source = 'manual' AND timestamp >= ?
-        '''
-        
-        # Analyse pour irrigation ML
-        ml_query = '''
-            SELECT 
-                MAX(volume_m3) as max_volume,
-                MIN(volume_m3) as min_volume,
-                AVG(volume_m3) as current_volume
-            FROM irrigation_logs 
-            WHERE source = 'ml' AND timestamp >= ?
-        '''
-        
-        manual_result = conn.execute(manual_query, (thirty_days_ago,)).fetchone()
-        ml_result = conn.execute(ml_query, (thirty_days_ago,)).fetchone()
+                source,
+                SUM(count) as count,
+                MAX(volume_max) as max_volume,
+                MIN(volume_min) as min_volume,
+                SUM(volume_sum) / NULLIF(SUM(volume_count), 0) as current_volume
+            FROM irrigation_daily_rollup 
+            WHERE day >= date('now', ?) AND source IN ('manual', 'ml')
+            GROUP BY source
+        ''', (f"-{days - 1} days",)).fetchall()
         
         conn.close()
         
+        results = {row["source"]: row for row in rows}
+        empty = {"max_volume": None, "min_volume": None, "current_volume": None}
+        manual_result = results.get("manual", empty)
+        ml_result = results.get("ml", empty)
+        
         # Préparer les données de réponse avec des valeurs par défaut
         analysis_data = {
             "manual": {
@@ -404,6 +505,7 @@ def get_irrigation_analysis():
         
         return jsonify({
             "status": "ok",
+            "days": days,
             "data": analysis_data
         }), 200
         
@@ -443,14 +545,19 @@ def get_trends():
 
 @irrigation_bp.route("/analytics/ml-predictions", methods=["GET"])
 def get_ml_predictions():
-    """Retourne les prédictions ML"""
+    """Retourne les prédictions ML précalculées (tous acteurs, ou ?actor_id=N)"""
     try:
-        return jsonify({
-            "nextIrrigationHours": 6,
-            "recommendedDuration": 30,
-            "soilCondition": "Optimal",
-            "weatherImpact": "Favorable"
-        }), 200
+        summary = forecast_engine.get_summary(request.args.get("actor_id", type=int))
+        if summary is None:
+            # Prévisions pas encore calculées: valeurs par défaut
+            summary = {
+                "nextIrrigationHours": 6,
+                "recommendedDuration": 30,
+                "soilCondition": "Optimal",
+                "weatherImpact": "Favorable",
+                "precomputed": False
+            }
+        return jsonify(summary), 200
     except Exception as e:
         print(f"❌ Erreur ML predictions: {e}")
         return jsonify({"error": str(e)}), 500
@@ -1,53 +1,238 @@
 
-from flask import Blueprint, jsonify
+from flask import Blueprint, Response, jsonify, request, stream_with_context
 from config.database import get_db_connection
+from services.retention_service import log_retention
+from datetime import datetime, timezone
+import base64
+import csv
+import io
+import json
+import re
+import zlib
 
 logs_bp = Blueprint('logs', __name__)
 
+MAX_LOGS_LIMIT = 500
+EXPORT_FETCH_ROWS = 1000
+
+# Type de log -> (table, taille de page par défaut, paramètre de filtre -> colonne)
+LOG_TABLES = {
+    "irrigation": ("irrigation_logs", 50, {"source": "source", "action": "action", "status": "mqtt_status"}),
+    "weather": ("weather_logs", 20, {"location": "location"}),
+    "mqtt": ("mqtt_logs", 30, {"topic": "topic", "status": "status_code"}),
+}
+
+def encode_cursor(row):
+    """Curseur opaque: position (timestamp, id) de la dernière ligne renvoyée"""
+    return base64.urlsafe_b64encode(f"{row['timestamp']}|{row['id']}".encode()).decode()
+
+def decode_cursor(cursor):
+    timestamp, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 1)
+    return timestamp, int(row_id)
+
+def normalize_timestamp(value):
+    """'2025-06-01', '2025-06-01T08:00:00Z', '...+02:00' -> format SQLite UTC 'YYYY-MM-DD HH:MM:SS'
+
+    Sans décalage horaire la date est lue en UTC; sinon elle est convertie en UTC.
+    """
+    value = value.strip()
+    # "+02:00" non encodé dans l'URL arrive comme " 02:00"
+    value = re.sub(r"(\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?) (\d{2}:?\d{2})$", r"\1+\2", value)
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Date invalide: {value}")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed.strftime("%Y-%m-%d %H:%M:%S")
+
+def build_log_filters(filters):
+    """Conditions SQL des filtres communs (égalités, since/until)"""
+    conditions, params = [], []
+    for arg, column in filters.items():
+        value = request.args.get(arg)
+        if value is not None:
+            conditions.append(f"{column} = ?")
+            params.append(value)
+    if request.args.get("since"):
+        conditions.append("timestamp >= ?")
+        params.append(normalize_timestamp(request.args["since"]))
+    if request.args.get("until"):
+        conditions.append("timestamp < ?")
+        params.append(normalize_timestamp(request.args["until"]))
+    return conditions, params
+
+def query_logs(kind):
+    """Page de logs du plus récent au plus ancien (pagination par curseur)
+
+    La page suivante est indiquée dans l'en-tête X-Next-Cursor; le corps reste une liste.
+    """
+    table, default_limit, filters = LOG_TABLES[kind]
+    limit = request.args.get("limit", default_limit, type=int)
+    if limit is None or limit < 1:
+        raise ValueError("limit doit être un entier positif")
+    limit = min(limit, MAX_LOGS_LIMIT)
+
+    conditions, params = build_log_filters(filters)
+    if request.args.get("cursor"):
+        try:
+            cursor_params = decode_cursor(request.args["cursor"])
+        except Exception:
+            raise ValueError("Curseur invalide")
+        conditions.append("(timestamp, id) < (?, ?)")
+        params.extend(cursor_params)
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    conn = get_db_connection()
+    try:
+        logs = conn.execute(f'''
+            SELECT * FROM {table} {where}
+            ORDER BY timestamp DESC, id DESC
+            LIMIT ?
+        ''', params + [limit + 1]).fetchall()
+    finally:
+        conn.close()
+
+    response = jsonify([dict(log) for log in logs[:limit]])
+    if len(logs) > limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(logs[limit - 1])
+        response.headers["Access-Control-Expose-Headers"] = "X-Next-Cursor"
+    return response
+
+def export_rows(table, conditions, params, filters, include_archives):
+    """Lignes lues au fil de l'eau (archives mensuelles puis base), ordre chronologique"""
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    conn = get_db_connection()
+    try:
+        # Même instantané pour la borne des archives et la lecture de la base
+        conn.execute("BEGIN")
+        first = conn.execute(f'SELECT timestamp, id FROM {table} ORDER BY timestamp, id LIMIT 1').fetchone()
+        cursor = conn.execute(f'''
+            SELECT * FROM {table} {where}
+            ORDER BY timestamp, id
+        ''', params)
+        columns = [description[0] for description in cursor.description]
+        yield columns
+
+        if include_archives:
+            since = normalize_timestamp(request.args["since"]) if request.args.get("since") else None
+            until = normalize_timestamp(request.args["until"]) if request.args.get("until") else None
+            wanted = {column: request.args[arg] for arg, column in filters.items() if request.args.get(arg) is not None}
+            for row in log_retention.iter_rows(table, since, until, before=tuple(first) if first else None):
+                if all(str(row.get(column)) == value for column, value in wanted.items()):
+                    yield tuple(row.get(column) for column in columns)
+
+        while True:
+            rows = cursor.fetchmany(EXPORT_FETCH_ROWS)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        conn.close()
+
+def ndjson_chunks(rows):
+    columns = next(rows)
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(dict(zip(columns, row)), ensure_ascii=False))
+        if len(lines) >= EXPORT_FETCH_ROWS:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+def csv_chunks(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() > 65536:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: format gzip
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
+
 @logs_bp.route('/logs/irrigation', methods=['GET'])
 def get_irrigation_logs():
-    """Récupère les logs d'irrigation"""
-    try:
-        conn = get_db_connection()
-        logs = conn.execute('''
-            SELECT * FROM irrigation_logs 
-            ORDER BY timestamp DESC 
-            LIMIT 50
-        ''').fetchall()
-        conn.close()
-        
-        return jsonify([dict(log) for log in logs])
+    """Récupère les logs d'irrigation (?limit, cursor, since, until, source, action, status)"""
+    try:
+        return query_logs("irrigation")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @logs_bp.route('/logs/weather', methods=['GET'])
 def get_weather_logs():
-    """Récupère les logs météo"""
-    try:
-        conn = get_db_connection()
-        logs = conn.execute('''
-            SELECT * FROM weather_logs 
-            ORDER BY timestamp DESC 
-            LIMIT 20
-        ''').fetchall()
-        conn.close()
-        
-        return jsonify([dict(log) for log in logs])
+    """Récupère les logs météo (?limit, cursor, since, until, location)"""
+    try:
+        return query_logs("weather")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @logs_bp.route('/logs/mqtt', methods=['GET'])
 def get_mqtt_logs():
-    """Récupère les logs MQTT"""
-    try:
-        conn = get_db_connection()
-        logs = conn.execute('''
-            SELECT * FROM mqtt_logs 
-            ORDER BY timestamp DESC 
-            LIMIT 30
-        ''').fetchall()
-        conn.close()
-        
-        return jsonify([dict(log) for log in logs])
+    """Récupère les logs MQTT (?limit, cursor, since, until, topic, status)"""
+    try:
+        return query_logs("mqtt")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@logs_bp.route('/logs/<kind>/export', methods=['GET'])
+def export_logs(kind):
+    """Export complet en flux (?format=ndjson|csv, gzip=true, archives=false, since, until et filtres de la liste)"""
+    if kind not in LOG_TABLES:
+        return jsonify({"error": f"Type de logs inconnu: {kind}"}), 404
+
+    export_format = request.args.get("format", "ndjson").lower()
+    if export_format not in ("ndjson", "csv"):
+        return jsonify({"error": "format doit être ndjson ou csv"}), 400
+
+    try:
+        table, _, filters = LOG_TABLES[kind]
+        conditions, params = build_log_filters(filters)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    include_archives = request.args.get("archives", "true").lower() == "true"
+    rows = export_rows(table, conditions, params, filters, include_archives)
+    chunks = ndjson_chunks(rows) if export_format == "ndjson" else csv_chunks(rows)
+    filename = f"{table}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{export_format}"
+    mimetype = "application/x-ndjson" if export_format == "ndjson" else "text/csv"
+
+    if request.args.get("gzip", "false").lower() == "true":
+        chunks = gzip_chunks(chunks)
+        filename += ".gz"
+        mimetype = "application/gzip"
+
+    return Response(
+        stream_with_context(chunks),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+@logs_bp.route('/logs/<kind>/archives', methods=['GET'])
+def list_log_archives(kind):
+    """Archives mensuelles disponibles (les lignes se lisent via /logs/<kind>/export)"""
+    if kind not in LOG_TABLES:
+        return jsonify({"error": f"Type de logs inconnu: {kind}"}), 404
+    try:
+        return jsonify({
+            "table": LOG_TABLES[kind][0],
+            "archives": log_retention.months(LOG_TABLES[kind][0]),
+            "retention": log_retention.stats()
+        }), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
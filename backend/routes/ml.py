@@ -0,0 +1,48 @@
+from flask import Blueprint, request, jsonify
+from services.ml_service import ml_service
+from services.ml_pool import ml_inference
+from services.ml_coalescer import ml_coalescer
+from services.forecast_service import forecast_engine
+from services.feature_service import feature_assembler
+
+ml_bp = Blueprint("ml", __name__)
+
+@ml_bp.route("/ml/stats", methods=["GET"])
+def get_ml_stats():
+    """Statistiques du service ML (cache, regroupement des requêtes, backend d'inférence)"""
+    try:
+        return jsonify({
+            "status": "ok",
+            "model_loaded": ml_service.model is not None,
+            "model": ml_service.get_model_info(),
+            "cache": ml_service.get_cache_stats(),
+            "coalescer": ml_coalescer.stats() if ml_coalescer else {"enabled": False},
+            "inference": ml_inference.stats() if ml_inference is not ml_service else {"backend": "thread"},
+            "forecast": forecast_engine.stats(),
+            "features": feature_assembler.stats()
+        }), 200
+    except Exception as e:
+        print(f"❌ Erreur stats ML: {e}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+@ml_bp.route("/ml/reload", methods=["POST"])
+def reload_ml_model():
+    """Recharge le modèle ML à chaud (arrière-plan par défaut, ?wait=true pour attendre)"""
+    try:
+        if request.args.get("wait", "false").lower() == "true":
+            reloaded = ml_service.reload_model()
+            return jsonify({
+                "success": reloaded,
+                "message": "Modèle rechargé" if reloaded else "Rechargement refusé ou déjà en cours",
+                "model": ml_service.get_model_info()
+            }), 200 if reloaded else 409
+        
+        started = ml_service.reload_model_async()
+        return jsonify({
+            "success": started,
+            "message": "Rechargement lancé en arrière-plan" if started else "Rechargement déjà en cours",
+            "model": ml_service.get_model_info()
+        }), 202 if started else 409
+    except Exception as e:
+        print(f"❌ Erreur rechargement ML: {e}")
+        return jsonify({"success": False, "message": str(e)}), 500
@@ -1,9 +1,36 @@
 
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request
 from services.weather_service import weather_service
+from services.timeseries import lttb_indices
+from config.database import get_db_connection
+from config.mqtt_config import WEATHER_BATCH_MAX_LOCATIONS
+from routes.logs import normalize_timestamp
+from services.retention_service import log_retention
+from datetime import datetime, timedelta, timezone
+import numpy as np
 
 weather_bp = Blueprint('weather', __name__)
 
+@weather_bp.route('/weather', methods=['GET'])
+def get_weather_batch():
+    """Météo de plusieurs localités en une requête (?locations=thies,taiba-ndiaye)"""
+    try:
+        locations = [l.strip() for l in request.args.get("locations", "").split(",") if l.strip()]
+        if not locations:
+            return jsonify({"error": "Paramètre locations requis (ex: ?locations=thies,taiba-ndiaye)"}), 400
+        if len(locations) > WEATHER_BATCH_MAX_LOCATIONS:
+            return jsonify({"error": f"{WEATHER_BATCH_MAX_LOCATIONS} localités maximum par requête"}), 400
+        
+        results, errors = weather_service.get_weather_batch(locations)
+        return jsonify({
+            "locations": results,
+            "errors": errors,
+            "count": len(results)
+        })
+    except Exception as e:
+        print(f"Erreur météo multi-localités: {e}")
+        return jsonify({"error": str(e)}), 500
+
 @weather_bp.route('/weather/<location>', methods=['GET'])
 def get_weather(location):
     """Récupère les données météo pour une ville"""
@@ -32,3 +59,129 @@ def get_realtime_weather(location):
     except Exception as e:
         print(f"Erreur météo temps réel pour {location}: {e}")
         return jsonify({"error": str(e)}), 500
+
+# Regroupement SQL des logs météo par intervalle (timestamps UTC) et fenêtre par défaut (jours)
+HISTORY_BUCKETS = {
+    "hour": ("strftime('%Y-%m-%d %H:00:00', timestamp)", 7),
+    "day": ("date(timestamp)", 180),
+    "week": ("date(timestamp, '-6 days', 'weekday 1')", 365),  # Semaine commençant le lundi
+}
+HISTORY_METRICS = ("temperature", "humidity", "wind_speed", "precipitation")
+
+def load_archived_history(conn, names, since, until):
+    """Copie dans une table temporaire les logs météo archivés (rétention) de la fenêtre
+
+    Lus seulement si la fenêtre commence avant la plus vieille ligne en base; retourne
+    le nombre de lignes copiées (la table disparaît avec la transaction).
+    """
+    first = conn.execute('SELECT timestamp, id FROM weather_logs ORDER BY timestamp, id LIMIT 1').fetchone()
+    if not log_retention.months("weather_logs") or (first and since >= first[0]):
+        return 0
+    
+    conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS weather_history_archive (timestamp TEXT, {', '.join(f'{m} REAL' for m in HISTORY_METRICS)})")
+    conn.execute("DELETE FROM temp.weather_history_archive")
+    wanted = set(names)
+    rows = (
+        tuple(row.get(column) for column in ("timestamp",) + HISTORY_METRICS)
+        for row in log_retention.iter_rows("weather_logs", since, until, before=tuple(first) if first else None)
+        if row.get("location") in wanted
+    )
+    cursor = conn.executemany(
+        f"INSERT INTO temp.weather_history_archive VALUES ({', '.join('?' * (1 + len(HISTORY_METRICS)))})", rows
+    )
+    return cursor.rowcount
+
+@weather_bp.route('/weather/<location>/history', methods=['GET'])
+def get_weather_history(location):
+    """Série météo agrégée (?interval=hour|day|week, since, until, points, metric)
+
+    Min/max/moyenne par intervalle, calculés en SQL sur la base et les archives
+    mensuelles (rétention des logs). points=N réduit la série à N
+    intervalles par LTTB sur `metric` (température par défaut) pour les graphiques.
+    """
+    try:
+        interval = request.args.get("interval", "day")
+        if interval not in HISTORY_BUCKETS:
+            return jsonify({"error": "interval doit être hour, day ou week"}), 400
+        metric = request.args.get("metric", "temperature")
+        if metric not in HISTORY_METRICS:
+            return jsonify({"error": f"metric doit être parmi {', '.join(HISTORY_METRICS)}"}), 400
+        points = request.args.get("points", type=int)
+        if points is None and request.args.get("points"):
+            return jsonify({"error": "points doit être un entier"}), 400
+        if points is not None and points < 3:
+            return jsonify({"error": "points doit être au moins 3 (LTTB garde le premier et le dernier point)"}), 400
+        
+        bucket, default_days = HISTORY_BUCKETS[interval]
+        try:
+            since = normalize_timestamp(request.args["since"]) if request.args.get("since") else \
+                (datetime.now(timezone.utc) - timedelta(days=default_days)).strftime("%Y-%m-%d %H:%M:%S")
+            until = normalize_timestamp(request.args["until"]) if request.args.get("until") else None
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        names = weather_service.log_location_names(location)
+        conditions = [f"location IN ({','.join('?' * len(names))})", "timestamp >= ?"]
+        params = names + [since]
+        if until:
+            conditions.append("timestamp < ?")
+            params.append(until)
+        aggregates = ", ".join(
+            f"MIN({m}), MAX({m}), AVG({m})" for m in HISTORY_METRICS
+        )
+        columns = ", ".join(("timestamp",) + HISTORY_METRICS)
+        
+        conn = get_db_connection()
+        try:
+            # Même instantané pour la borne des archives et la lecture de la base
+            conn.execute("BEGIN")
+            source = f"SELECT {columns} FROM weather_logs WHERE {' AND '.join(conditions)}"
+            archived = load_archived_history(conn, names, since, until)
+            if archived:
+                source += f" UNION ALL SELECT {columns} FROM temp.weather_history_archive"
+            rows = conn.execute(f'''
+                SELECT {bucket} AS bucket, COUNT(*), {aggregates}, SUM(precipitation)
+                FROM ({source})
+                GROUP BY bucket
+                ORDER BY bucket
+            ''', params).fetchall()
+        finally:
+            conn.close()
+        
+        times = [row[0] for row in rows]
+        # Colonnes: count, (min, max, moyenne) par métrique, cumul de précipitation
+        values = np.array([tuple(row)[1:] for row in rows], dtype=np.float64).reshape(len(rows), 2 + 3 * len(HISTORY_METRICS))
+        
+        if points and len(rows) > points:
+            # Axe x: secondes depuis le premier intervalle
+            x = np.array([datetime.fromisoformat(t).timestamp() for t in times])
+            mean_column = 1 + 3 * HISTORY_METRICS.index(metric) + 2
+            keep = lttb_indices(x, values[:, mean_column], points)
+            times = [times[i] for i in keep]
+            values = values[keep]
+        
+        def column(index, decimals=2):
+            return [None if np.isnan(v) else round(float(v), decimals) for v in values[:, index]]
+        
+        series = {"time": times, "count": [int(v) for v in values[:, 0]]}
+        for position, name in enumerate(HISTORY_METRICS):
+            base = 1 + 3 * position
+            series[f"{name}_min"] = column(base)
+            series[f"{name}_max"] = column(base + 1)
+            series[f"{name}_mean"] = column(base + 2)
+        series["precipitation_total"] = column(1 + 3 * len(HISTORY_METRICS))
+        
+        return jsonify({
+            "location": location,
+            "interval": interval,
+            "since": since,
+            "until": until,
+            "buckets": len(rows),
+            "archived_rows": archived,
+            "points": len(times),
+            "series": series
+        }), 200
+        
+    except Exception as e:
+        print(f"❌ Erreur historique météo pour {location}: {e}")
+        return jsonify({"error": str(e)}), 500
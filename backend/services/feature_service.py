@@ -0,0 +1,142 @@
+# services/feature_service.py
+import threading
+import numpy as np
+from config.database import get_db_connection
+from services.ml_service import FEATURE_COLUMNS, CATEGORY_CODES, NB_FEATURES
+from services.weather_service import weather_service
+
+# Valeurs sol par défaut (mêmes que getDefaultSoilClimateFeatures côté frontend), par index de feature
+DEFAULT_SOIL_FEATURES = {
+    6: 26.0,   # Température_sol_(°C)
+    7: 42.0,   # Humidité_sol_(%)
+    8: 1.2,    # EC_(dS/m)
+    9: 6.8,    # pH_sol
+    10: 45.0,  # Azote_(mg/kg)
+    11: 38.0,  # Phosphore_(mg/kg)
+    12: 152.0, # Potassium_(mg/kg)
+    13: 3.0    # Fertilité_(score)
+}
+
+# Tables de correspondance acteur -> code numérique du modèle, calculées une fois
+TYPE_SOL_CODES = {label: code for code, label in CATEGORY_CODES["Type_sol"].items()}
+TYPE_CULTURE_CODES = {"1": 1, "2": 2, "3": 3, "4": 4}  # Valeurs du formulaire RegisterActor
+DEFAULT_TYPE_SOL_CODE = 2
+DEFAULT_TYPE_CULTURE_CODE = 1
+
+def encode_type_sol(type_sol):
+    return TYPE_SOL_CODES.get(str(type_sol or "").strip().lower(), DEFAULT_TYPE_SOL_CODE)
+
+def encode_type_culture(type_culture):
+    return TYPE_CULTURE_CODES.get(str(type_culture or "").strip(), DEFAULT_TYPE_CULTURE_CODE)
+
+def actor_static_features(actor):
+    """Partie du vecteur qui ne dépend que de l'acteur (culture, superficie, sol)"""
+    return {
+        4: encode_type_culture(actor["type_culture"]),
+        5: float(actor["superficie"] or 0),
+        14: encode_type_sol(actor["type_sol"])
+    }
+
+def build_horizon_features(actors, forecast):
+    """Matrice (acteurs × heures) × 15 pour des acteurs partageant la même météo horaire
+
+    Les lignes sont groupées par acteur: la ligne i * nb_heures + h correspond à
+    l'acteur i à l'heure h de la prévision.
+    """
+    hours = len(forecast["times"])
+    matrix = np.empty((len(actors) * hours, NB_FEATURES), dtype=np.float64)
+
+    matrix[:, 0] = np.tile(forecast["temperature"], len(actors))    # Température_air_(°C)
+    matrix[:, 1] = np.tile(forecast["precipitation"], len(actors))  # Précipitation_(mm)
+    matrix[:, 2] = np.tile(forecast["humidity"], len(actors))       # Humidité_air_(%)
+    matrix[:, 3] = np.tile(forecast["wind_speed"], len(actors))     # Vent_moyen_(km/h)
+
+    for index, value in DEFAULT_SOIL_FEATURES.items():
+        matrix[:, index] = value
+
+    statics = [actor_static_features(actor) for actor in actors]
+    for index in (4, 5, 14):
+        matrix[:, index] = np.repeat([static[index] for static in statics], hours)
+
+    return matrix
+
+def location_key(actor):
+    """Localité météo d'un acteur (clé commune au cache météo et aux prévisions)"""
+    return (actor["localite"] or actor["region"] or "thies").strip().lower()
+
+class FeatureAssembler:
+    """Construit côté serveur le vecteur de 15 features d'un acteur pour /api/arroser
+
+    Les lignes acteurs sont gardées en mémoire jusqu'à leur modification
+    (invalidate() appelé par les routes acteurs); la météo courante est lue dans
+    le cache de weather_service.
+    """
+
+    def __init__(self):
+        self._actors = {}   # id acteur -> (localité, features statiques)
+        self._lock = threading.Lock()
+
+    def invalidate(self, actor_id=None):
+        """Oublie un acteur modifié ou supprimé (tous si actor_id est None)"""
+        with self._lock:
+            if actor_id is None:
+                self._actors.clear()
+            else:
+                self._actors.pop(actor_id, None)
+
+    def _get_actor(self, actor_id):
+        with self._lock:
+            cached = self._actors.get(actor_id)
+        if cached:
+            return cached
+
+        conn = get_db_connection()
+        try:
+            actor = conn.execute('''
+                SELECT id, localite, region, superficie, type_sol, type_culture
+                FROM actors WHERE id = ?
+            ''', (actor_id,)).fetchone()
+        finally:
+            conn.close()
+        if not actor:
+            return None
+
+        cached = (location_key(actor), actor_static_features(actor))
+        with self._lock:
+            self._actors[actor_id] = cached
+        return cached
+
+    def build(self, actor_id, soil=None):
+        """Vecteur de 15 features pour un acteur, ou None si l'acteur n'existe pas
+
+        Sans capteurs sol en base, les features sol prennent les valeurs par défaut;
+        `soil` permet de les remplacer ({"pH_sol": 6.5, ...}, noms de FEATURE_COLUMNS).
+        """
+        if soil is not None and not isinstance(soil, dict):
+            raise ValueError("soil doit être un objet {nom de feature: valeur}")
+        actor = self._get_actor(actor_id)
+        if actor is None:
+            return None
+        location, statics = actor
+
+        features = [0.0] * NB_FEATURES
+        for index, value in weather_service.get_weather_features(location).items():
+            features[index] = value
+        for index, value in DEFAULT_SOIL_FEATURES.items():
+            features[index] = value
+        for name, value in (soil or {}).items():
+            index = FEATURE_COLUMNS.index(name) if name in FEATURE_COLUMNS else -1
+            if index not in DEFAULT_SOIL_FEATURES:
+                raise ValueError(f"Feature sol inconnue: {name}")
+            features[index] = float(value)
+        for index, value in statics.items():
+            features[index] = value
+        return features
+
+    def stats(self):
+        return {
+            "actors": len(self._actors)
+        }
+
+# Instance globale
+feature_assembler = FeatureAssembler()
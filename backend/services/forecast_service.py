@@ -0,0 +1,216 @@
+# services/forecast_service.py
+import threading
+import time
+import numpy as np
+from datetime import datetime, timezone
+from config.database import get_db_connection
+from config.mqtt_config import (
+    FORECAST_HORIZON_HOURS,
+    FORECAST_REFRESH_SECONDS,
+    FORECAST_WEATHER_TTL_SECONDS,
+    FORECAST_IRRIGATION_THRESHOLD_M3,
+    DEBIT_LITRES_PAR_MIN
+)
+from services.ml_service import ml_service
+from services.weather_service import weather_service
+from services.feature_service import build_horizon_features, location_key
+
+def _utc_text(timestamp):
+    """Format des dates SQLite (CURRENT_TIMESTAMP est en UTC)"""
+    return datetime.fromtimestamp(int(timestamp), timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+class ForecastEngine:
+    """Besoins d'irrigation de chaque acteur pour les prochaines heures, précalculés en arrière-plan
+
+    Seuls les acteurs modifiés, ou dont la météo horaire a changé, sont recalculés;
+    toutes leurs lignes (acteur × heure) passent dans un seul appel vectorisé au modèle.
+    """
+
+    def __init__(self, horizon_hours=FORECAST_HORIZON_HOURS, refresh_seconds=FORECAST_REFRESH_SECONDS,
+                 weather_ttl_seconds=FORECAST_WEATHER_TTL_SECONDS):
+        self.horizon_hours = horizon_hours
+        self.refresh_seconds = refresh_seconds
+        self.weather_ttl_seconds = weather_ttl_seconds
+        self._weather = {}           # localité -> (prévision, horodatage monotonic)
+        self._actor_signatures = {}  # id acteur -> (signature acteur, signature météo, version modèle)
+        self._refresh_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self.last_refresh = None
+        self.last_refresh_seconds = None
+        self.last_updated_actors = 0
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="ml-forecast", daemon=True)
+        self._thread.start()
+        print(f"📈 Moteur de prévisions ML démarré ({self.horizon_hours}h, toutes les {self.refresh_seconds:.0f}s)")
+
+    def notify_actors_changed(self):
+        """Déclenche un rafraîchissement anticipé après une modification des acteurs"""
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"❌ Erreur rafraîchissement prévisions ML: {e}")
+            self._wake.wait(self.refresh_seconds)
+            self._wake.clear()
+
+    def _get_forecast(self, location):
+        """Météo horaire d'une localité, refetchée au plus une fois par TTL"""
+        cached = self._weather.get(location)
+        if cached and time.monotonic() - cached[1] < self.weather_ttl_seconds:
+            return cached[0]
+        forecast = weather_service.get_hourly_forecast(location, self.horizon_hours)
+        self._weather[location] = (forecast, time.monotonic())
+        return forecast
+
+    def refresh(self):
+        """Recalcule les prévisions des acteurs dont l'entrée a changé"""
+        with self._refresh_lock:
+            started = time.perf_counter()
+            conn = get_db_connection()
+            try:
+                actors = conn.execute('''
+                    SELECT id, localite, region, superficie, type_sol, type_culture, updated_at
+                    FROM actors
+                ''').fetchall()
+
+                groups = {}
+                for actor in actors:
+                    groups.setdefault(location_key(actor), []).append(actor)
+
+                model_version = ml_service.get_model_info()["version"]
+                dirty_groups = []
+                signatures = {}
+                for location, group in groups.items():
+                    forecast = self._get_forecast(location)
+                    weather_signature = (
+                        forecast["source"],
+                        int(forecast["times"][0]),
+                        hash(forecast["temperature"].tobytes() + forecast["precipitation"].tobytes())
+                    )
+                    dirty = []
+                    for actor in group:
+                        signature = (tuple(actor), weather_signature, model_version)
+                        signatures[actor["id"]] = signature
+                        if self._actor_signatures.get(actor["id"]) != signature:
+                            dirty.append(actor)
+                    if dirty:
+                        dirty_groups.append((forecast, dirty))
+
+                removed = set(self._actor_signatures) - set(signatures)
+                rows = self._score(dirty_groups)
+                dirty_ids = [actor["id"] for _, group in dirty_groups for actor in group]
+
+                conn.executemany('DELETE FROM ml_forecasts WHERE actor_id = ?',
+                                 [(actor_id,) for actor_id in dirty_ids + sorted(removed)])
+                conn.executemany('''
+                    INSERT OR REPLACE INTO ml_forecasts (actor_id, forecast_time, volume_m3, duree_minutes, precipitation)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', rows)
+                conn.execute('DELETE FROM ml_forecasts WHERE forecast_time < ?',
+                             (_utc_text(time.time() // 3600 * 3600),))
+                conn.commit()
+            finally:
+                conn.close()
+
+            self._actor_signatures = signatures
+            self.last_refresh = datetime.now()
+            self.last_refresh_seconds = time.perf_counter() - started
+            self.last_updated_actors = len(dirty_ids)
+            if dirty_ids or removed:
+                print(f"📈 Prévisions ML: {len(dirty_ids)} acteur(s) recalculé(s), {len(rows)} lignes "
+                      f"en {self.last_refresh_seconds:.2f}s")
+
+    def _score(self, dirty_groups):
+        """Un seul passage du modèle sur toutes les lignes (acteur × heure) à recalculer"""
+        if not dirty_groups:
+            return []
+
+        matrices = [build_horizon_features(group, forecast) for forecast, group in dirty_groups]
+        volumes = ml_service.predict_volumes(np.vstack(matrices))
+        durations = volumes * 1000 / DEBIT_LITRES_PAR_MIN
+
+        rows = []
+        offset = 0
+        for forecast, group in dirty_groups:
+            times = [_utc_text(t) for t in forecast["times"]]
+            precipitation = forecast["precipitation"]
+            for actor in group:
+                for hour, forecast_time in enumerate(times):
+                    rows.append((
+                        actor["id"],
+                        forecast_time,
+                        round(float(volumes[offset + hour]), 3),
+                        round(float(durations[offset + hour]), 2),
+                        round(float(precipitation[hour]), 2)
+                    ))
+                offset += len(times)
+        return rows
+
+    def get_summary(self, actor_id=None):
+        """Prochaine irrigation recommandée, à partir des prévisions précalculées"""
+        now_text = _utc_text(time.time() // 3600 * 3600)
+        conn = get_db_connection()
+        try:
+            if actor_id is not None:
+                hourly = conn.execute('''
+                    SELECT forecast_time, volume_m3, duree_minutes, precipitation
+                    FROM ml_forecasts WHERE actor_id = ? AND forecast_time >= ?
+                    ORDER BY forecast_time
+                ''', (actor_id, now_text)).fetchall()
+                actors_count = 1 if hourly else 0
+            else:
+                hourly = conn.execute('''
+                    SELECT forecast_time, AVG(volume_m3) AS volume_m3, AVG(duree_minutes) AS duree_minutes,
+                           AVG(precipitation) AS precipitation
+                    FROM ml_forecasts WHERE forecast_time >= ?
+                    GROUP BY forecast_time ORDER BY forecast_time
+                ''', (now_text,)).fetchall()
+                actors_count = conn.execute('SELECT COUNT(DISTINCT actor_id) FROM ml_forecasts').fetchone()[0]
+        finally:
+            conn.close()
+
+        if not hourly:
+            return None
+
+        volumes = np.array([row["volume_m3"] for row in hourly])
+        durations = np.array([row["duree_minutes"] for row in hourly])
+        rain_24h = float(sum(row["precipitation"] or 0 for row in hourly[:24]))
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+
+        needed = np.flatnonzero(volumes >= FORECAST_IRRIGATION_THRESHOLD_M3)
+        index = int(needed[0]) if len(needed) else int(np.argmax(volumes))
+        next_time = datetime.strptime(hourly[index]["forecast_time"], "%Y-%m-%d %H:%M:%S")
+
+        summary = {
+            "nextIrrigationHours": max(0, round((next_time - now).total_seconds() / 3600)) if len(needed) else len(hourly),
+            "recommendedDuration": round(float(durations[index])),
+            "soilCondition": "Optimal",  # Pas de capteurs sol: valeurs par défaut du modèle
+            "weatherImpact": "Pluie prévue" if rain_24h >= 5 else "Favorable",
+            "precomputed": True,
+            "horizonHours": len(hourly),
+            "actorsCount": actors_count,
+            "computedAt": self.last_refresh.strftime("%Y-%m-%d %H:%M:%S") if self.last_refresh else None
+        }
+        if actor_id is not None:
+            summary["hourly"] = [dict(row) for row in hourly]
+        return summary
+
+    def stats(self):
+        return {
+            "horizon_hours": self.horizon_hours,
+            "actors": len(self._actor_signatures),
+            "locations": len(self._weather),
+            "last_refresh": self.last_refresh.strftime("%Y-%m-%d %H:%M:%S") if self.last_refresh else None,
+            "last_refresh_seconds": round(self.last_refresh_seconds, 3) if self.last_refresh_seconds else None,
+            "last_updated_actors": self.last_updated_actors
+        }
+
+# Instance globale
+forecast_engine = ForecastEngine()
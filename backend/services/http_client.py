@@ -0,0 +1,140 @@
+# services/http_client.py
+import random
+import threading
+import time
+from datetime import datetime
+import requests
+from requests.adapters import HTTPAdapter
+
+class CircuitOpenError(Exception):
+    """Appel refusé sans contacter le serveur: disjoncteur ouvert"""
+
+class CircuitBreaker:
+    """Disjoncteur: ouvert après `threshold` échecs consécutifs, un appel d'essai après `reset_seconds`
+
+    closed -> open (échecs consécutifs) -> half_open (un seul appel d'essai)
+    -> closed si l'essai réussit, sinon de nouveau open pour reset_seconds.
+    """
+
+    def __init__(self, threshold, reset_seconds):
+        self.threshold = max(1, threshold)
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = None
+        self.opened_count = 0
+        self.rejected = 0
+        self.last_error = None
+
+    def allow(self):
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = "half_open"
+                return True  # Appel d'essai
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self, error):
+        with self._lock:
+            self.failures += 1
+            self.last_error = str(error)
+            if self.state == "half_open" or self.failures >= self.threshold:
+                if self.state != "open":
+                    self.opened_count += 1
+                    print(f"⚠️ Disjoncteur ouvert après {self.failures} échec(s): {error}")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def stats(self):
+        with self._lock:
+            retry_in = None
+            if self.state == "open":
+                retry_in = round(max(0.0, self.reset_seconds - (time.monotonic() - self.opened_at)), 1)
+            return {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "threshold": self.threshold,
+                "retry_in_seconds": retry_in,
+                "opened_count": self.opened_count,
+                "rejected": self.rejected,
+                "last_error": self.last_error
+            }
+
+class HttpClient:
+    """Session HTTP partagée (keep-alive, pool dimensionné) avec retries et disjoncteur
+
+    Les erreurs de connexion, 429 et 5xx sont retentées avec un backoff exponentiel à
+    jitter complet; un timeout de lecture ne l'est pas (un appel lent ne doit pas
+    bloquer plusieurs fois `timeout`). Une fois les essais épuisés l'appel compte comme
+    un échec pour le disjoncteur. Les autres réponses (200, 401, 404...) sont rendues
+    telles quelles.
+    """
+
+    RETRY_STATUS = {429, 500, 502, 503, 504}
+
+    def __init__(self, pool_size=10, timeout=10, connect_timeout=3, retries=2, backoff_seconds=0.3,
+                 breaker_threshold=5, breaker_reset_seconds=60):
+        self.timeout = (min(connect_timeout, timeout), timeout)
+        self.retries = max(0, retries)
+        self.backoff_seconds = backoff_seconds
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_reset_seconds)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.retried = 0
+        self.failed = 0
+        self.last_success = None
+
+    def get(self, url, params=None):
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"Disjoncteur ouvert pour {url}")
+
+        error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                with self._stats_lock:
+                    self.retried += 1
+                time.sleep(random.uniform(0, self.backoff_seconds * 2 ** (attempt - 1)))
+            with self._stats_lock:
+                self.requests += 1
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+            except requests.ReadTimeout as e:
+                error = e  # Serveur lent: on n'attend pas un timeout complet de plus
+                break
+            except requests.RequestException as e:
+                error = e
+                continue
+            if response.status_code in self.RETRY_STATUS:
+                error = requests.HTTPError(f"HTTP {response.status_code}", response=response)
+                continue
+            self.breaker.record_success()
+            self.last_success = datetime.now()
+            return response
+
+        with self._stats_lock:
+            self.failed += 1
+        self.breaker.record_failure(error)
+        raise error
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "requests": self.requests,
+                "retried": self.retried,
+                "failed": self.failed,
+                "last_success": self.last_success.strftime("%Y-%m-%d %H:%M:%S") if self.last_success else None,
+                "breaker": self.breaker.stats()
+            }
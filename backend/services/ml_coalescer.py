@@ -0,0 +1,110 @@
+# services/ml_coalescer.py
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FuturesTimeoutError
+from config.mqtt_config import (
+    ML_COALESCE_ENABLED,
+    ML_COALESCE_WINDOW_MS,
+    ML_COALESCE_MAX_BATCH,
+    ML_PREDICT_TIMEOUT_SECONDS
+)
+from services.ml_pool import ml_inference, InferenceTimeoutError
+
+class PredictionCoalescer:
+    """Regroupe les prédictions concurrentes en un seul appel vectorisé au modèle
+    
+    Les requêtes arrivées pendant la fenêtre (ou jusqu'à max_batch_size) partent
+    ensemble dans predict_irrigation_batch; chaque appelant reçoit sa propre ligne.
+    """
+    
+    def __init__(self, backend, window_ms=ML_COALESCE_WINDOW_MS, max_batch_size=ML_COALESCE_MAX_BATCH,
+                 timeout_seconds=ML_PREDICT_TIMEOUT_SECONDS):
+        self.backend = backend
+        self.window_seconds = window_ms / 1000.0
+        self.max_batch_size = max(1, max_batch_size)
+        self.timeout_seconds = timeout_seconds
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.batches = 0
+        self.last_batch_size = 0
+        self.max_batch_seen = 0
+
+    def predict_irrigation(self, features_data):
+        """Même contrat que MLService.predict_irrigation, via un lot partagé"""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((features_data, future))
+        
+        try:
+            result = future.result(timeout=self.timeout_seconds)
+        except FuturesTimeoutError:
+            future.cancel()  # Retirée du prochain lot si elle n'est pas encore partie
+            raise InferenceTimeoutError(f"Prédiction ML non terminée après {self.timeout_seconds}s")
+        if result["status"] != "ok":
+            raise Exception(f"Erreur prédiction ML: {result['message']}")
+        return {key: value for key, value in result.items() if key not in ("index", "status")}
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="ml-coalescer", daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window_seconds
+            
+            # Collecter les requêtes de la fenêtre, sans dépasser la taille max
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            
+            self._dispatch(batch)
+
+    def _dispatch(self, batch):
+        pending = [(features, future) for features, future in batch if future.set_running_or_notify_cancel()]
+        if not pending:
+            return
+        
+        try:
+            results = self.backend.predict_irrigation_batch([features for features, _ in pending])
+            for (_, future), result in zip(pending, results):
+                future.set_result(result)
+        except Exception as e:
+            print(f"❌ Erreur lot ML regroupé ({len(pending)} requêtes): {e}")
+            for _, future in pending:
+                future.set_exception(e)
+        
+        with self._stats_lock:
+            self.requests += len(pending)
+            self.batches += 1
+            self.last_batch_size = len(pending)
+            self.max_batch_seen = max(self.max_batch_seen, len(pending))
+
+    def stats(self):
+        """Profondeur de file et tailles de lots"""
+        with self._stats_lock:
+            return {
+                "enabled": True,
+                "window_ms": self.window_seconds * 1000,
+                "max_batch_size": self.max_batch_size,
+                "queue_depth": self._queue.qsize(),
+                "requests": self.requests,
+                "batches": self.batches,
+                "last_batch_size": self.last_batch_size,
+                "max_batch_seen": self.max_batch_seen,
+                "avg_batch_size": round(self.requests / self.batches, 2) if self.batches else 0.0
+            }
+
+# Instance globale (None si le regroupement est désactivé)
+ml_coalescer = PredictionCoalescer(ml_inference) if ML_COALESCE_ENABLED else None
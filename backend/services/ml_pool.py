@@ -0,0 +1,148 @@
+# services/ml_pool.py
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from config.mqtt_config import (
+    ML_INFERENCE_BACKEND,
+    ML_POOL_WORKERS,
+    ML_POOL_MAX_PENDING,
+    ML_POOL_START_METHOD,
+    ML_PREDICT_TIMEOUT_SECONDS
+)
+from services.ml_service import ml_service
+
+class InferenceBusyError(Exception):
+    """File d'inférence pleine: la requête est refusée au lieu d'attendre"""
+
+class InferenceTimeoutError(Exception):
+    """Prédiction non terminée dans le délai imparti"""
+
+def _init_worker():
+    # Le modèle est chargé une fois par processus (import), ou hérité du parent si fork
+    from services.ml_service import ml_service as worker_service
+    print(f"🧵 Worker ML prêt (modèle {worker_service.get_model_info()['version']})")
+
+def _predict_one(features_data):
+    from services.ml_service import ml_service as worker_service
+    return worker_service.predict_irrigation(features_data)
+
+def _predict_batch(features_rows):
+    from services.ml_service import ml_service as worker_service
+    return worker_service.predict_irrigation_batch(features_rows)
+
+class ProcessInferenceBackend:
+    """Exécute les prédictions ML dans un pool de processus, hors des threads Flask
+    
+    La file est bornée (max_pending) et chaque appel a un délai maximal, pour qu'une
+    rafale de prédictions ne bloque ni le polling du statut ni les callbacks MQTT.
+    """
+    
+    def __init__(self, workers=ML_POOL_WORKERS, max_pending=ML_POOL_MAX_PENDING,
+                 timeout_seconds=ML_PREDICT_TIMEOUT_SECONDS, start_method=ML_POOL_START_METHOD):
+        self.workers = max(1, workers)
+        self.max_pending = max(1, max_pending)
+        self.timeout_seconds = timeout_seconds
+        # Pas de fork par défaut: le processus a déjà des threads (MQTT, logs, prévisions, météo)
+        # dont les verrous pourraient rester pris dans les workers
+        if not start_method:
+            start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        self._context = multiprocessing.get_context(start_method)
+        if start_method == "forkserver":
+            # Le forkserver ne précharge que le modèle, pas __main__ (start.py -> app -> routes)
+            self._context.set_forkserver_preload(["services.ml_service"])
+        self._executor = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._stats_lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.failures = 0
+
+    def predict_irrigation(self, features_data):
+        return self._submit(_predict_one, features_data)
+
+    def predict_irrigation_batch(self, features_rows):
+        return self._submit(_predict_batch, features_rows)
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=self._context,
+                    initializer=_init_worker
+                )
+            return self._executor
+
+    def _submit(self, function, argument):
+        if not self._slots.acquire(blocking=False):
+            with self._stats_lock:
+                self.rejected += 1
+            raise InferenceBusyError(f"File d'inférence ML pleine ({self.max_pending} requêtes en attente)")
+        
+        try:
+            future = self._get_executor().submit(function, argument)
+        except Exception:
+            self._slots.release()
+            raise
+        
+        with self._stats_lock:
+            self.pending += 1
+        future.add_done_callback(self._on_done)
+        
+        try:
+            return future.result(timeout=self.timeout_seconds)
+        except FuturesTimeoutError:
+            future.cancel()  # Retirée de la file si aucun worker ne l'a encore prise
+            with self._stats_lock:
+                self.timeouts += 1
+            raise InferenceTimeoutError(f"Prédiction ML non terminée après {self.timeout_seconds}s")
+        except BrokenProcessPool as e:
+            print(f"❌ Pool d'inférence ML cassé, recréation au prochain appel: {e}")
+            self.recycle()
+            raise
+
+    def _on_done(self, future):
+        self._slots.release()
+        with self._stats_lock:
+            self.pending -= 1
+            if future.cancelled() or future.exception() is not None:
+                self.failures += 1
+            else:
+                self.completed += 1
+
+    def recycle(self):
+        """Remplace les workers (après un rechargement du modèle); les appels en cours se terminent"""
+        with self._lock:
+            old, self._executor = self._executor, None
+        if old is not None:
+            old.shutdown(wait=False)
+            print("🔁 Pool d'inférence ML recyclé")
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "backend": "process",
+                "workers": self.workers,
+                "pending": self.pending,
+                "max_pending": self.max_pending,
+                "timeout_seconds": self.timeout_seconds,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+                "failures": self.failures
+            }
+
+def _create_inference_backend():
+    if ML_INFERENCE_BACKEND != "process":
+        return ml_service
+    backend = ProcessInferenceBackend()
+    ml_service.add_reload_listener(backend.recycle)
+    print(f"🧵 Inférence ML en pool de processus ({backend.workers} workers)")
+    return backend
+
+# Backend d'inférence global: le service en thread, ou le pool de processus
+ml_inference = _create_inference_backend()
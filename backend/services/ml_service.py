@@ -1,94 +1,422 @@
 
-import joblib
-import pandas as pd
 import numpy as np
 import os
-from config.mqtt_config import MODEL_PATH, DEBIT_LITRES_PAR_MIN
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from config.mqtt_config import (
+    MODEL_PATH,
+    DEBIT_LITRES_PAR_MIN,
+    ML_FAST_INFERENCE,
+    ML_NUMPY_ENGINE,
+    ML_CACHE_SIZE,
+    ML_CACHE_TTL_SECONDS,
+    ML_MODEL_WATCH_SECONDS
+)
+from services.tree_engine import CompiledTreeModel, encode_features, file_sha256
+
+# Colonnes attendues par le modèle, dans l'ordre des 15 features
+FEATURE_COLUMNS = [
+    "Température_air_(°C)", "Précipitation_(mm)", "Humidité_air_(%)", "Vent_moyen_(km/h)",
+    "Type_culture", "Périmètre_agricole_(m2)", "Température_sol_(°C)", "Humidité_sol_(%)",
+    "EC_(dS/m)", "pH_sol", "Azote_(mg/kg)", "Phosphore_(mg/kg)", "Potassium_(mg/kg)",
+    "Fertilité_(score)", "Type_sol"
+]
+NB_FEATURES = len(FEATURE_COLUMNS)
+
+# Codes numériques envoyés par le frontend -> libellés appris par le OneHotEncoder du modèle
+# (un code sans libellé est traité comme catégorie inconnue, ignorée par l'encodeur)
+CATEGORY_CODES = {
+    "Type_culture": {},
+    "Type_sol": {1: "sableux", 2: "argileux", 3: "limoneux"},
+}
+
+# Décimales conservées par colonne pour la clé du cache de prédictions:
+# des mesures capteurs quasi identiques (41.2 vs 41.3 %) partagent la même entrée
+CACHE_DECIMALS = {
+    "Température_air_(°C)": 0, "Précipitation_(mm)": 1, "Humidité_air_(%)": 0, "Vent_moyen_(km/h)": 0,
+    "Type_culture": 0, "Périmètre_agricole_(m2)": -1, "Température_sol_(°C)": 0, "Humidité_sol_(%)": 0,
+    "EC_(dS/m)": 1, "pH_sol": 1, "Azote_(mg/kg)": 0, "Phosphore_(mg/kg)": 0, "Potassium_(mg/kg)": 0,
+    "Fertilité_(score)": 0, "Type_sol": 0
+}
+
+# Parcelles synthétiques pour préchauffer un modèle avant de l'activer
+WARMUP_FEATURES = np.array([
+    [25, 0, 65, 12, 1, 10000, 26, 42, 1.2, 6.8, 45, 38, 152, 3, 2],
+    [34, 0, 40, 18, 1, 25000, 31, 25, 1.0, 6.5, 38, 32, 135, 2, 1],
+    [24, 15, 85, 8, 1, 2500, 24, 60, 1.4, 7.1, 52, 42, 168, 4, 3],
+], dtype=np.float64)
+
+class PredictionCache:
+    """Cache LRU borné avec expiration (TTL) des résultats de prédiction"""
+    
+    def __init__(self, max_size=ML_CACHE_SIZE, ttl_seconds=ML_CACHE_TTL_SECONDS, decimals=None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        decimals = {**CACHE_DECIMALS, **(decimals or {})}
+        self._decimals = [decimals[column] for column in FEATURE_COLUMNS]
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    @property
+    def enabled(self):
+        return self.max_size > 0 and self.ttl_seconds > 0
+    
+    def make_key(self, features_array, model_version=""):
+        """Clé quantifiée: chaque feature arrondie à la précision de sa colonne"""
+        return (model_version,) + tuple(
+            round(float(value), ndigits) for value, ndigits in zip(features_array, self._decimals)
+        )
+    
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[1] > self.ttl_seconds:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry[0])
+    
+    def put(self, key, result):
+        with self._lock:
+            self._entries[key] = (dict(result), time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0
+            }
+
+def build_booster_layout(model):
+    """Traduit le pipeline (OneHotEncoder + passthrough) en index de colonnes du booster
+    
+    Chaque colonne numérique est recopiée telle quelle; chaque code catégoriel connu
+    active la colonne one-hot de son libellé, comme le ferait le ColumnTransformer.
+    """
+    if hasattr(model, "steps"):
+        preprocessor = model.steps[0][1] if len(model.steps) > 1 else None
+        estimator = model.steps[-1][1]
+    else:
+        preprocessor = None
+        estimator = model
+    
+    feature_names = getattr(model, "feature_names_in_", None)
+    if feature_names is not None and list(feature_names) != FEATURE_COLUMNS:
+        raise ValueError(f"Ordre des features du modèle inattendu: {list(feature_names)}")
+    
+    booster = estimator.get_booster()
+    numeric_src, numeric_dst = [], []
+    cat_src, cat_code, cat_dst = [], [], []
+    
+    if preprocessor is None:
+        numeric_src = list(range(NB_FEATURES))
+        numeric_dst = list(range(NB_FEATURES))
+        n_columns = NB_FEATURES
+    else:
+        if getattr(preprocessor, "sparse_output_", False):
+            raise ValueError("Sortie creuse du préprocesseur non supportée")
+        for name, transformer, columns in preprocessor.transformers_:
+            if transformer == "drop":
+                continue
+            output = preprocessor.output_indices_[name]
+            indices = [FEATURE_COLUMNS.index(c) if isinstance(c, str) else int(c) for c in columns]
+            
+            if transformer == "passthrough" or getattr(transformer, "func", "") is None:
+                numeric_src.extend(indices)
+                numeric_dst.extend(range(output.start, output.stop))
+            elif hasattr(transformer, "categories_"):
+                if transformer.drop is not None or transformer.handle_unknown != "ignore":
+                    raise ValueError(f"OneHotEncoder '{name}' non supporté (drop/handle_unknown)")
+                dst = output.start
+                for index, categories in zip(indices, transformer.categories_):
+                    codes = CATEGORY_CODES.get(FEATURE_COLUMNS[index], {})
+                    for category in categories:
+                        for code, label in codes.items():
+                            if label == category:
+                                cat_src.append(index)
+                                cat_code.append(code)
+                                cat_dst.append(dst)
+                        dst += 1
+            else:
+                raise ValueError(f"Transformer '{name}' non supporté: {type(transformer).__name__}")
+        n_columns = max(o.stop for o in preprocessor.output_indices_.values())
+    
+    if booster.num_features() != n_columns:
+        raise ValueError(f"Le booster attend {booster.num_features()} colonnes, layout: {n_columns}")
+    
+    try:
+        iteration_range = (0, estimator.best_iteration + 1)
+    except AttributeError:
+        iteration_range = (0, 0)  # Tous les arbres
+    
+    return {
+        "booster": booster,
+        "n_columns": n_columns,
+        "iteration_range": iteration_range,
+        "numeric_src": np.array(numeric_src, dtype=np.intp),
+        "numeric_dst": np.array(numeric_dst, dtype=np.intp),
+        "cat_src": np.array(cat_src, dtype=np.intp),
+        "cat_code": np.array(cat_code, dtype=np.float64),
+        "cat_dst": np.array(cat_dst, dtype=np.intp),
+    }
+
+def features_frame(features_matrix):
+    """Construit le DataFrame du modèle, avec les colonnes catégorielles en libellés"""
+    import pandas as pd  # Seulement pour le pipeline sklearn, pas pour les moteurs rapides
+    
+    features_df = pd.DataFrame(features_matrix, columns=FEATURE_COLUMNS)
+    for column, codes in CATEGORY_CODES.items():
+        features_df[column] = [codes.get(code, str(code)) for code in features_df[column]]
+    return features_df
+
+class LoadedModel:
+    """Modèle prêt à prédire; remplacé d'un seul bloc lors d'un rechargement"""
+    
+    def __init__(self, model=None, fast_layout=None, version="fallback", source=None):
+        self.model = model
+        self.fast_layout = fast_layout
+        self.version = version
+        self.source = source
+        self.loaded_at = datetime.now()
+    
+    @property
+    def engine(self):
+        if self.model is None:
+            return "fallback"
+        if isinstance(self.model, CompiledTreeModel):
+            return "numpy"
+        return "xgboost" if self.fast_layout is not None else "pipeline"
 
 class MLService:
     def __init__(self):
-        self.model = None
         self.model_path = os.path.join("models", "xgboost_arrosage_litres.pkl")
+        self.compiled_model_path = os.path.splitext(self.model_path)[0] + ".npz"
+        self._active = LoadedModel()
+        self._buffers = threading.local()  # Buffer float32 préalloué par thread
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        self._reload_listeners = []
+        self.last_reload_error = None
+        self.cache = PredictionCache()
         self.load_model()
 
+    @property
+    def model(self):
+        return self._active.model
+
     def load_model(self):
         """Charge le modèle XGBoost pré-entraîné"""
+        self._activate(self._load_candidate())
+
+    def reload_model(self):
+        """Recharge le modèle: chargement et préchauffage à part, puis bascule atomique
+        
+        Les prédictions en cours continuent sur l'ancien modèle jusqu'à la bascule.
+        Retourne False si un rechargement est déjà en cours.
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            print("⚠️ Rechargement du modèle déjà en cours")
+            return False
+        
+        try:
+            candidate = self._load_candidate()
+            if candidate.model is None and self._active.model is not None:
+                raise ValueError("Nouveau modèle introuvable ou illisible, modèle actuel conservé")
+            self._warm_up(candidate)
+            self._activate(candidate)
+            self.last_reload_error = None
+            for listener in self._reload_listeners:
+                listener()
+            return True
+        except Exception as e:
+            self.last_reload_error = str(e)
+            print(f"❌ Rechargement du modèle refusé: {e}")
+            return False
+        finally:
+            self._reload_lock.release()
+
+    def reload_model_async(self):
+        """Lance reload_model dans un thread de fond"""
+        if self._reload_lock.locked():
+            return False
+        threading.Thread(target=self.reload_model, name="ml-reload", daemon=True).start()
+        return True
+
+    def add_reload_listener(self, callback):
+        """Appelé après chaque rechargement réussi (ex: recycler les workers d'inférence)"""
+        self._reload_listeners.append(callback)
+
+    def _activate(self, candidate):
+        self._active = candidate  # Affectation atomique: jamais de modèle à moitié chargé
+        self.cache.clear()  # Les prédictions en cache viennent de l'ancien modèle
+        print(f"🤖 Modèle actif: {candidate.engine} (version {candidate.version})")
+
+    def _warm_up(self, candidate):
+        """Quelques prédictions synthétiques avant la bascule (compilation, caches du moteur)"""
+        if candidate.model is None:
+            return
+        volumes = self._model_volumes(candidate, WARMUP_FEATURES)
+        if len(volumes) != len(WARMUP_FEATURES) or not np.all(np.isfinite(volumes)):
+            raise ValueError(f"Préchauffage invalide: {volumes}")
+        print(f"🔥 Modèle préchauffé: {np.round(volumes, 3).tolist()} m³")
+
+    def _load_candidate(self):
+        """Charge le modèle sans toucher au modèle actif"""
+        compiled = self._load_compiled_model()
+        if compiled is not None:
+            print(f"✅ Modèle compilé NumPy chargé ({compiled.n_trees} arbres, sans xgboost).")
+            return LoadedModel(compiled, version=compiled.source_sha256[:12], source=self.compiled_model_path)
+        
         if not os.path.exists(self.model_path):
             print(f"⚠️ Modèle non trouvé à l'emplacement : {self.model_path}")
             print("🔄 Utilisation du mode fallback avec calculs par défaut")
-            self.model = None
-            return
+            return LoadedModel()
         
         try:
-            self.model = joblib.load(self.model_path)
+            import joblib
+            model = joblib.load(self.model_path)
             print("✅ Modèle XGBoost chargé avec succès.")
         except Exception as e:
             print(f"❌ Erreur lors du chargement du modèle : {e}")
             print("🔄 Utilisation du mode fallback")
-            self.model = None
+            return LoadedModel()
+        
+        return LoadedModel(
+            model,
+            fast_layout=self._prepare_fast_inference(model),
+            version=file_sha256(self.model_path)[:12],
+            source=self.model_path
+        )
+
+    def _load_compiled_model(self):
+        """Charge l'export NumPy du modèle (export_model.py) s'il correspond au .pkl actuel"""
+        if not ML_NUMPY_ENGINE or not os.path.exists(self.compiled_model_path):
+            return None
+        
+        try:
+            compiled = CompiledTreeModel.load(self.compiled_model_path)
+            if compiled.feature_columns != FEATURE_COLUMNS:
+                print("⚠️ Modèle compilé ignoré: ordre des features différent")
+                return None
+            if os.path.exists(self.model_path) and compiled.source_sha256 != file_sha256(self.model_path):
+                print("⚠️ Modèle compilé périmé (le .pkl a changé), relancer export_model.py")
+                return None
+            return compiled
+        except Exception as e:
+            print(f"⚠️ Modèle compilé illisible, chargement du .pkl: {e}")
+            return None
+
+    def _prepare_fast_inference(self, model):
+        """Vérifie une seule fois l'ordre des features et prépare l'appel direct au booster"""
+        if not ML_FAST_INFERENCE:
+            return None
+        
+        try:
+            layout = build_booster_layout(model)
+            print(f"⚡ Inférence rapide activée: booster XGBoost, {layout['n_columns']} colonnes float32")
+            return layout
+        except Exception as e:
+            print(f"⚠️ Inférence rapide indisponible, utilisation du pipeline pandas: {e}")
+            return None
+
+    def start_model_watcher(self, interval_seconds=ML_MODEL_WATCH_SECONDS):
+        """Surveille les fichiers du modèle et recharge à chaque remplacement (0 = désactivé)"""
+        if interval_seconds <= 0 or (self._watcher and self._watcher.is_alive()):
+            return
+        self._watcher = threading.Thread(
+            target=self._watch_model_files,
+            args=(interval_seconds,),
+            name="ml-model-watch",
+            daemon=True
+        )
+        self._watcher.start()
+        print(f"👀 Surveillance du modèle toutes les {interval_seconds}s")
+
+    def _model_files_signature(self):
+        signature = []
+        for path in (self.model_path, self.compiled_model_path):
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def _watch_model_files(self, interval_seconds):
+        loaded_signature = self._model_files_signature()
+        while True:
+            time.sleep(interval_seconds)
+            current = self._model_files_signature()
+            if current == loaded_signature:
+                continue
+            
+            # Attendre la fin de la copie: le fichier doit être stable sur deux lectures
+            time.sleep(min(interval_seconds, 2))
+            if self._model_files_signature() != current:
+                continue
+            
+            print("🔁 Fichier modèle modifié, rechargement en arrière-plan...")
+            loaded_signature = current
+            self.reload_model()
+
+    def get_model_info(self):
+        """Version et date de chargement du modèle actif"""
+        active = self._active
+        return {
+            "engine": active.engine,
+            "version": active.version,
+            "source": active.source,
+            "loaded_at": active.loaded_at.strftime("%Y-%m-%d %H:%M:%S"),
+            "reloading": self._reload_lock.locked(),
+            "last_reload_error": self.last_reload_error
+        }
 
     def predict_irrigation(self, features_data):
         """Prédit la quantité d'eau nécessaire basée sur les features agro-climatiques"""
         try:
-            # Vérifier le format des données d'entrée
-            if not isinstance(features_data, list) or len(features_data) != 15:
-                raise ValueError(f"Exactement 15 features requises, reçu: {len(features_data) if isinstance(features_data, list) else 'non-liste'}")
+            features_array = self._validate_features(features_data)
+            active = self._active
             
-            # ✅ CORRECTION FINALE: Conversion directe sans validation isnan problématique
-            try:
-                features_array = np.array([float(f) for f in features_data], dtype=np.float64)
-                print(f"🔧 Features converties en float64: {features_array}")
-                
-                # Validation manuelle simple sans NumPy isnan
-                for i, val in enumerate(features_array):
-                    if val != val:  # Test NaN simple (NaN != NaN)
-                        raise ValueError(f"Feature {i} est NaN")
-                        
-            except (ValueError, TypeError) as e:
-                raise ValueError(f"Toutes les features doivent être numériques: {e}")
+            cache_key = self.cache.make_key(features_array, active.version) if self.cache.enabled else None
+            if cache_key is not None:
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    return cached
             
-            # Si le modèle est disponible, l'utiliser
-            if self.model:
-                try:
-                    # Colonnes attendues par le modèle
-                    columns = [
-                        "Température_air_(°C)", "Précipitation_(mm)", "Humidité_air_(%)", "Vent_moyen_(km/h)",
-                        "Type_culture", "Périmètre_agricole_(m2)", "Température_sol_(°C)", "Humidité_sol_(%)",
-                        "EC_(dS/m)", "pH_sol", "Azote_(mg/kg)", "Phosphore_(mg/kg)", "Potassium_(mg/kg)",
-                        "Fertilité_(score)", "Type_sol"
-                    ]
-                    
-                    # Créer DataFrame avec conversion sûre
-                    features_df = pd.DataFrame([features_array], columns=columns)
-                    
-                    # Prédiction avec gestion d'erreur
-                    try:
-                        volume_m3_raw = self.model.predict(features_df)[0]
-                        volume_m3 = max(0.001, float(volume_m3_raw))  # Minimum 1L
-                        print(f"✅ Prédiction ML avec modèle: {volume_m3:.3f} m³")
-                    except Exception as numpy_error:
-                        print(f"⚠️ Erreur modèle, utilisation du fallback: {numpy_error}")
-                        volume_m3 = self._calculate_fallback_volume(features_array)
-                    
-                except Exception as model_error:
-                    print(f"⚠️ Erreur avec le modèle, utilisation du fallback: {model_error}")
-                    volume_m3 = self._calculate_fallback_volume(features_array)
+            print(f"🔧 Features converties en float64: {features_array}")
+            
+            volume_m3 = float(self._predict_volumes(features_array.reshape(1, -1), active)[0])
+            if active.model is not None:
+                print(f"✅ Prédiction ML avec modèle: {volume_m3:.3f} m³")
             else:
-                # Calcul par défaut si pas de modèle
-                volume_m3 = self._calculate_fallback_volume(features_array)
                 print(f"✅ Prédiction fallback: {volume_m3:.3f} m³")
             
-            # Calculs dérivés
-            volume_litres = volume_m3 * 1000
-            duree_minutes = volume_litres / DEBIT_LITRES_PAR_MIN
-            duree_sec = max(30, int(duree_minutes * 60))  # Minimum 30 secondes
-            
-            result = {
-                "volume_m3": float(round(volume_m3, 3)),
-                "volume_litres": float(round(volume_litres, 2)),
-                "duree_minutes": float(round(duree_minutes, 2)),
-                "duree_sec": duree_sec
-            }
+            result = self._build_result(volume_m3)
+            if cache_key is not None:
+                self.cache.put(cache_key, result)
             
             print(f"📊 Résultat ML final: {result}")
             return result
@@ -97,32 +425,141 @@ class MLService:
             print(f"❌ Erreur prédiction ML: {str(e)}")
             raise Exception(f"Erreur prédiction ML: {str(e)}")
 
+    def predict_irrigation_batch(self, features_rows):
+        """Prédit les volumes de plusieurs parcelles avec un seul appel au modèle
+        
+        Retourne un résultat par ligne, dans l'ordre d'entrée. Une ligne invalide
+        produit une erreur locale sans bloquer les autres lignes.
+        """
+        if not isinstance(features_rows, list):
+            raise ValueError("Une liste de vecteurs de features est requise")
+        
+        results = [None] * len(features_rows)
+        valid_indices = []
+        valid_rows = []
+        
+        for index, row in enumerate(features_rows):
+            try:
+                valid_rows.append(self._validate_features(row))
+                valid_indices.append(index)
+            except ValueError as e:
+                results[index] = {"index": index, "status": "error", "message": str(e)}
+        
+        # Les lignes déjà en cache ne repassent pas par le modèle
+        active = self._active
+        pending = []
+        for index, row in zip(valid_indices, valid_rows):
+            cache_key = self.cache.make_key(row, active.version) if self.cache.enabled else None
+            cached = self.cache.get(cache_key) if cache_key is not None else None
+            if cached is not None:
+                results[index] = {"index": index, "status": "ok", **cached}
+            else:
+                pending.append((index, row, cache_key))
+        
+        if pending:
+            volumes = self._predict_volumes(np.vstack([row for _, row, _ in pending]), active)
+            for (index, _, cache_key), volume_m3 in zip(pending, volumes):
+                result = self._build_result(float(volume_m3))
+                if cache_key is not None:
+                    self.cache.put(cache_key, result)
+                results[index] = {"index": index, "status": "ok", **result}
+        
+        print(f"📊 Prédiction ML batch: {len(valid_rows)}/{len(features_rows)} lignes valides")
+        return results
+
+    def predict_volumes(self, features_matrix):
+        """Volumes (m³) d'une matrice N×15 construite côté serveur, en un seul passage vectorisé"""
+        return self._predict_volumes(np.asarray(features_matrix, dtype=np.float64), self._active)
+
+    def _validate_features(self, features_data):
+        """Valide un vecteur de 15 features et le convertit en float64"""
+        if not isinstance(features_data, list) or len(features_data) != NB_FEATURES:
+            raise ValueError(f"Exactement {NB_FEATURES} features requises, reçu: {len(features_data) if isinstance(features_data, list) else 'non-liste'}")
+        
+        try:
+            features_array = np.asarray(features_data, dtype=np.float64)
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"Toutes les features doivent être numériques: {e}")
+        if features_array.ndim != 1:
+            raise ValueError("Toutes les features doivent être numériques: vecteur plat attendu")
+        
+        nan_mask = np.isnan(features_array)
+        if nan_mask.any():
+            raise ValueError(f"Toutes les features doivent être numériques: Feature {int(np.argmax(nan_mask))} est NaN")
+        
+        return features_array
+
+    def _predict_volumes(self, features_matrix, active):
+        """Volumes (m³) pour une matrice N×15 déjà validée, en un seul appel au modèle"""
+        if active.model is not None:
+            try:
+                return self._model_volumes(active, features_matrix)
+            except Exception as model_error:
+                print(f"⚠️ Erreur avec le modèle, utilisation du fallback: {model_error}")
+        
+        return self._calculate_fallback_volumes(features_matrix)
+
+    def _model_volumes(self, active, features_matrix):
+        if isinstance(active.model, CompiledTreeModel):
+            volumes = active.model.predict(features_matrix)
+        elif active.fast_layout is not None:
+            volumes = self._predict_fast(active.fast_layout, features_matrix)
+        else:
+            volumes = active.model.predict(features_frame(features_matrix))
+        return np.maximum(0.001, np.asarray(volumes, dtype=np.float64))  # Minimum 1L
+
+    def _predict_fast(self, layout, features_matrix):
+        """Prédiction directe par le booster, sans DataFrame ni pipeline sklearn"""
+        buffer = None
+        if features_matrix.shape[0] == 1:
+            buffer = getattr(self._buffers, "row", None)
+            if buffer is None or buffer.shape[1] != layout["n_columns"]:
+                buffer = self._buffers.row = np.zeros((1, layout["n_columns"]), dtype=np.float32)
+        
+        encoded = encode_features(features_matrix, layout, out=buffer)
+        return layout["booster"].inplace_predict(encoded, iteration_range=layout["iteration_range"])
+
+    def _build_result(self, volume_m3):
+        """Calculs dérivés (volume, durée) à partir du volume prédit en m³"""
+        volume_litres = volume_m3 * 1000
+        duree_minutes = volume_litres / DEBIT_LITRES_PAR_MIN
+        duree_sec = max(30, int(duree_minutes * 60))  # Minimum 30 secondes
+        
+        return {
+            "volume_m3": float(round(volume_m3, 3)),
+            "volume_litres": float(round(volume_litres, 2)),
+            "duree_minutes": float(round(duree_minutes, 2)),
+            "duree_sec": duree_sec
+        }
+
     def _calculate_fallback_volume(self, features):
         """Calcul par défaut basé sur les paramètres agro-climatiques"""
         try:
-            temp_air = float(features[0])  # Température_air_(°C)
-            humidite_air = float(features[2])  # Humidité_air_(%)
-            perimetre = float(features[5])  # Périmètre_agricole_(m2)
-            humidite_sol = float(features[7])  # Humidité_sol_(%)
-            
-            # Calcul simple basé sur les conditions
-            base_volume = 0.4  # Volume de base en m³ (400L)
-            
-            # Ajustements selon conditions
-            if temp_air > 30:
-                base_volume += 0.2  # Plus chaud = plus d'eau
-            if humidite_air < 60:
-                base_volume += 0.15  # Air sec = plus d'eau
-            if humidite_sol < 40:
-                base_volume += 0.25  # Sol sec = plus d'eau
-            if perimetre > 5000:
-                base_volume += 0.1  # Grande surface = plus d'eau
-                
-            return max(0.3, min(2.0, base_volume))  # Entre 300L et 2000L
-            
+            features_matrix = np.asarray(features, dtype=np.float64).reshape(1, NB_FEATURES)
+            return float(self._calculate_fallback_volumes(features_matrix)[0])
         except Exception as e:
             print(f"⚠️ Erreur calcul fallback: {e}")
             return 0.4  # Valeur par défaut: 400L
 
+    def _calculate_fallback_volumes(self, features_matrix):
+        """Calcul par défaut vectorisé sur une matrice N×15 (mêmes règles pour toutes les lignes)"""
+        temp_air = features_matrix[:, 0]  # Température_air_(°C)
+        humidite_air = features_matrix[:, 2]  # Humidité_air_(%)
+        perimetre = features_matrix[:, 5]  # Périmètre_agricole_(m2)
+        humidite_sol = features_matrix[:, 7]  # Humidité_sol_(%)
+        
+        # Volume de base en m³ (400L), puis ajustements selon conditions
+        volumes = np.full(features_matrix.shape[0], 0.4)
+        volumes += np.where(temp_air > 30, 0.2, 0.0)  # Plus chaud = plus d'eau
+        volumes += np.where(humidite_air < 60, 0.15, 0.0)  # Air sec = plus d'eau
+        volumes += np.where(humidite_sol < 40, 0.25, 0.0)  # Sol sec = plus d'eau
+        volumes += np.where(perimetre > 5000, 0.1, 0.0)  # Grande surface = plus d'eau
+        
+        return np.clip(volumes, 0.3, 2.0)  # Entre 300L et 2000L
+
+    def get_cache_stats(self):
+        """Compteurs du cache de prédictions"""
+        return self.cache.stats()
+
 # Instance globale
 ml_service = MLService()
@@ -17,15 +17,27 @@ class MQTTService:
     def __init__(self):
         self.current_irrigation_thread = None
         self.stop_irrigation_event = threading.Event()
-        self.client = mqtt.Client(client_id="flask_backend")
-        self.client.on_connect = self.on_connect
-        self.client.on_publish = self.on_publish
-        try:
-            self.client.connect(MQTT_BROKER_HOST, MQTT_BROKER_PORT, 60)
-            self.client.loop_start()
-            print(f"✅ Connecté au broker MQTT {MQTT_BROKER_HOST}:{MQTT_BROKER_PORT}")
-        except Exception as e:
-            print(f"❌ Erreur de connexion MQTT : {e}")
+        # Connexion au premier usage (create_app ou première commande), pas à l'import:
+        # les workers ML qui réimportent l'application ne doivent pas ouvrir de session
+        # "flask_backend" concurrente sur le broker
+        self.client = None
+        self._client_lock = threading.Lock()
+
+    def connect(self):
+        """Client MQTT connecté (créé une seule fois par processus)"""
+        with self._client_lock:
+            if self.client is not None:
+                return self.client
+            self.client = mqtt.Client(client_id="flask_backend")
+            self.client.on_connect = self.on_connect
+            self.client.on_publish = self.on_publish
+            try:
+                self.client.connect(MQTT_BROKER_HOST, MQTT_BROKER_PORT, 60)
+                self.client.loop_start()
+                print(f"✅ Connecté au broker MQTT {MQTT_BROKER_HOST}:{MQTT_BROKER_PORT}")
+            except Exception as e:
+                print(f"❌ Erreur de connexion MQTT : {e}")
+            return self.client
 
     def on_connect(self, client, userdata, flags, rc):
         print("✅ Connecté au broker MQTT" if rc == 0 else f"❌ Connexion échouée avec code {rc}")
@@ -56,7 +68,7 @@ class MQTTService:
 
         try:
             print(f"📤 Publication MQTT: {payload} → {MQTT_TOPIC_DATA}")
-            result = self.client.publish(
+            result = self.connect().publish(
                 MQTT_TOPIC_DATA,
                 json.dumps(payload),
                 qos=MQTT_QOS,
@@ -0,0 +1,171 @@
+# services/retention_service.py
+import gzip
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from config import database
+from config.database import get_db_connection
+from config.mqtt_config import (
+    LOG_RETENTION_DAYS,
+    LOG_RETENTION_INTERVAL_SECONDS,
+    LOG_RETENTION_BATCH_ROWS
+)
+
+RETENTION_TABLES = ("irrigation_logs", "weather_logs", "mqtt_logs")
+
+class LogRetention:
+    """Déplace les logs plus vieux que la fenêtre chaude vers des archives mensuelles compressées
+
+    Les lignes sont archivées par petits lots dans l'ordre (timestamp, id): chaque lot est
+    ajouté au fichier <table>/<AAAA-MM>.ndjson.gz (un membre gzip de plus) puis supprimé
+    de la base dans une transaction courte, pour ne jamais bloquer longtemps les écritures.
+    Les agrégats journaliers (irrigation_daily_rollup) ne sont pas touchés.
+    """
+
+    def __init__(self, retention_days=LOG_RETENTION_DAYS, interval_seconds=LOG_RETENTION_INTERVAL_SECONDS,
+                 batch_rows=LOG_RETENTION_BATCH_ROWS):
+        self.retention_days = retention_days
+        self.interval_seconds = interval_seconds
+        self.batch_rows = batch_rows
+        self._run_lock = threading.Lock()
+        self._thread = None
+        self.archived = {table: 0 for table in RETENTION_TABLES}
+        self.last_run = None
+        self.last_run_seconds = None
+        self.last_error = None
+
+    @property
+    def enabled(self):
+        return self.retention_days > 0
+
+    @property
+    def archive_root(self):
+        return database.DATABASE_PATH.parent / "archives"
+
+    def archive_dir(self, table):
+        return self.archive_root / table
+
+    def cutoff(self):
+        """Limite de la fenêtre chaude, au format des timestamps SQLite (UTC)"""
+        limit = datetime.now(timezone.utc) - timedelta(days=self.retention_days)
+        return limit.strftime("%Y-%m-%d %H:%M:%S")
+
+    def start(self):
+        if not self.enabled or (self._thread and self._thread.is_alive()):
+            return
+        self._thread = threading.Thread(target=self._run, name="log-retention", daemon=True)
+        self._thread.start()
+        print(f"🗄️ Rétention des logs: {self.retention_days} jours en base, archives dans {self.archive_root}")
+
+    def _run(self):
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"❌ Erreur archivage logs: {e}")
+            time.sleep(self.interval_seconds)
+
+    def run_once(self):
+        """Archive toutes les lignes hors fenêtre, lot par lot; retourne le nombre de lignes déplacées"""
+        with self._run_lock:
+            started = time.perf_counter()
+            cutoff = self.cutoff()
+            moved = 0
+            for table in RETENTION_TABLES:
+                while True:
+                    count = self._archive_batch(table, cutoff)
+                    moved += count
+                    if count < self.batch_rows:
+                        break
+                    time.sleep(0.05)  # Laisse passer les écritures entre deux lots
+            self.last_run = datetime.now()
+            self.last_run_seconds = time.perf_counter() - started
+            self.last_error = None
+            if moved:
+                print(f"🗄️ {moved} ligne(s) de logs archivée(s) en {self.last_run_seconds:.2f}s")
+            return moved
+
+    def _archive_batch(self, table, cutoff):
+        conn = get_db_connection()
+        try:
+            rows = conn.execute(f'''
+                SELECT * FROM {table} WHERE timestamp < ?
+                ORDER BY timestamp, id LIMIT ?
+            ''', (cutoff, self.batch_rows)).fetchall()
+            if not rows:
+                return 0
+
+            by_month = {}
+            for row in rows:
+                by_month.setdefault(row["timestamp"][:7], []).append(dict(row))
+
+            directory = self.archive_dir(table)
+            directory.mkdir(parents=True, exist_ok=True)
+            for month, items in by_month.items():
+                payload = "".join(json.dumps(item, ensure_ascii=False) + "\n" for item in items)
+                with open(directory / f"{month}.ndjson.gz", "ab") as f:
+                    f.write(gzip.compress(payload.encode("utf-8")))
+                    f.flush()
+                    os.fsync(f.fileno())
+
+            # Supprimées seulement une fois écrites sur disque
+            conn.executemany(f'DELETE FROM {table} WHERE id = ?', [(row["id"],) for row in rows])
+            conn.commit()
+            self.archived[table] += len(rows)
+            return len(rows)
+        finally:
+            conn.close()
+
+    def months(self, table):
+        """Archives disponibles pour une table, du plus ancien au plus récent"""
+        directory = self.archive_dir(table)
+        if not directory.exists():
+            return []
+        return [
+            {"month": path.name[:7], "size_bytes": path.stat().st_size}
+            for path in sorted(directory.glob("*.ndjson.gz"))
+        ]
+
+    def iter_rows(self, table, since=None, until=None, before=None):
+        """Lignes archivées dans l'ordre (timestamp, id), bornées par since/until
+
+        before=(timestamp, id) arrête la lecture à la première ligne encore présente en
+        base (lignes archivées pendant la lecture: elles seront lues depuis la base).
+        """
+        last_key = None
+        for archive in self.months(table):
+            month = archive["month"]
+            if (since and month < since[:7]) or (until and month > until[:7]):
+                continue
+            path = self.archive_dir(table) / f"{month}.ndjson.gz"
+            try:
+                with gzip.open(path, "rt", encoding="utf-8") as f:
+                    for line in f:
+                        row = json.loads(line)
+                        key = (row["timestamp"], row["id"])
+                        if before and key >= tuple(before):
+                            return
+                        if last_key and key <= last_key:
+                            continue  # Lot réécrit après une interruption avant suppression
+                        last_key = key
+                        if (since and row["timestamp"] < since) or (until and row["timestamp"] >= until):
+                            continue
+                        yield row
+            except EOFError:
+                pass  # Lot en cours d'écriture: il sera lu à la prochaine requête
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "retention_days": self.retention_days,
+            "archived": dict(self.archived),
+            "last_run": self.last_run.strftime("%Y-%m-%d %H:%M:%S") if self.last_run else None,
+            "last_run_seconds": round(self.last_run_seconds, 3) if self.last_run_seconds is not None else None,
+            "last_error": self.last_error
+        }
+
+# Instance globale
+log_retention = LogRetention()
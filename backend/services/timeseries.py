@@ -0,0 +1,42 @@
+# services/timeseries.py
+import numpy as np
+
+def lttb_indices(x, y, threshold):
+    """Indices des points retenus par Largest-Triangle-Three-Buckets
+
+    Garde le premier et le dernier point, puis dans chaque seau le point formant le plus
+    grand triangle avec le point retenu précédent et la moyenne du seau suivant: la forme
+    de la courbe (pics de température, averses) est préservée avec `threshold` points.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # Valeurs manquantes: ne doivent ni gagner ni fausser les moyennes
+    y = np.where(np.isnan(y), np.nanmean(y) if np.isfinite(y).any() else 0.0, y)
+
+    # Seaux intérieurs: [bounds[i], bounds[i + 1]) pour i = 0..threshold-3
+    bounds = (np.arange(threshold - 1) * (n - 2) / (threshold - 2)).astype(np.int64) + 1
+    bounds[-1] = n - 1
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = bounds[bucket], bounds[bucket + 1]
+        # Seau suivant (le dernier point pour le dernier seau)
+        next_start = end
+        next_end = bounds[bucket + 2] if bucket + 2 < len(bounds) else n
+        mean_x = x[next_start:next_end].mean()
+        mean_y = y[next_start:next_end].mean()
+
+        area = np.abs(
+            (x[previous] - mean_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (mean_y - y[previous])
+        )
+        previous = start + int(np.argmax(area))
+        selected[bucket + 1] = previous
+    return selected
@@ -0,0 +1,162 @@
+# services/tree_engine.py
+import json
+import hashlib
+import numpy as np
+
+# Lignes évaluées ensemble: borne la matrice (lignes × arbres) des noeuds courants
+EVAL_CHUNK_ROWS = 4096
+
+def encode_features(features_matrix, layout, out=None):
+    """Matrice N×15 -> colonnes du booster (numériques recopiées, codes catégoriels en one-hot)"""
+    if out is None:
+        out = np.zeros((features_matrix.shape[0], int(layout["n_columns"])), dtype=np.float32)
+    else:
+        out.fill(0)
+    out[:, layout["numeric_dst"]] = features_matrix[:, layout["numeric_src"]]
+    out[:, layout["cat_dst"]] = features_matrix[:, layout["cat_src"]] == layout["cat_code"]
+    return out
+
+def file_sha256(path):
+    """Empreinte du modèle source, pour détecter un export périmé"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def compile_booster(booster, tree_limit=0):
+    """Aplatit les arbres d'un booster XGBoost (gbtree, régression) en tableaux NumPy
+
+    Tous les arbres sont concaténés; les index d'enfants sont absolus et une feuille
+    est marquée par feature = -1, sa valeur étant dans value. tree_limit > 0 ne garde
+    que les premiers arbres (meilleure itération en cas d'early stopping).
+    """
+    model = json.loads(booster.save_raw("json"))
+    learner = model["learner"]
+    objective = learner["objective"]["name"]
+    if objective not in ("reg:squarederror", "reg:linear"):
+        raise ValueError(f"Objectif non supporté par le moteur NumPy: {objective}")
+    if learner["gradient_booster"]["name"] != "gbtree":
+        raise ValueError(f"Booster non supporté: {learner['gradient_booster']['name']}")
+
+    base_score = float(str(learner["learner_model_param"]["base_score"]).strip("[]"))
+    trees = learner["gradient_booster"]["model"]["trees"]
+    if tree_limit > 0:
+        trees = trees[:tree_limit]
+
+    features, thresholds, lefts, rights, missings, values, roots = [], [], [], [], [], [], []
+    max_depth = 0
+    offset = 0
+    for tree in trees:
+        left = np.asarray(tree["left_children"], dtype=np.int32)
+        right = np.asarray(tree["right_children"], dtype=np.int32)
+        split_index = np.asarray(tree["split_indices"], dtype=np.int32)
+        split_condition = np.asarray(tree["split_conditions"], dtype=np.float32)
+        default_left = np.asarray(tree["default_left"], dtype=bool)
+        is_leaf = left == -1
+
+        roots.append(offset)
+        features.append(np.where(is_leaf, -1, split_index))
+        thresholds.append(np.where(is_leaf, 0, split_condition).astype(np.float32))
+        values.append(np.where(is_leaf, split_condition, 0).astype(np.float32))
+        # Une feuille pointe sur elle-même: l'évaluation vectorisée y reste stable
+        self_index = np.arange(len(left), dtype=np.int32) + offset
+        lefts.append(np.where(is_leaf, self_index, left + offset))
+        rights.append(np.where(is_leaf, self_index, right + offset))
+        missings.append(np.where(is_leaf, self_index, np.where(default_left, left, right) + offset))
+        max_depth = max(max_depth, _tree_depth(left, right))
+        offset += len(left)
+
+    return {
+        "feature": np.concatenate(features).astype(np.int32),
+        "threshold": np.concatenate(thresholds),
+        "left": np.concatenate(lefts).astype(np.int32),
+        "right": np.concatenate(rights).astype(np.int32),
+        "missing": np.concatenate(missings).astype(np.int32),
+        "value": np.concatenate(values),
+        "roots": np.asarray(roots, dtype=np.int32),
+        "max_depth": np.int32(max_depth),
+        "base_score": np.float32(base_score),
+    }
+
+def _tree_depth(left, right):
+    depth = 0
+    level = [0]
+    while level:
+        children = [c for n in level for c in (left[n], right[n]) if c != -1]
+        if children:
+            depth += 1
+        level = children
+    return depth
+
+def save_compiled_model(path, trees, layout, feature_columns, source_sha256=""):
+    """Écrit le modèle compilé (arbres + encodage des features) dans un fichier .npz"""
+    np.savez_compressed(
+        path,
+        **trees,
+        n_columns=np.int32(layout["n_columns"]),
+        numeric_src=layout["numeric_src"],
+        numeric_dst=layout["numeric_dst"],
+        cat_src=layout["cat_src"],
+        cat_code=layout["cat_code"],
+        cat_dst=layout["cat_dst"],
+        feature_columns=np.asarray(feature_columns),
+        source_sha256=np.asarray(source_sha256),
+    )
+
+class CompiledTreeModel:
+    """Évaluateur NumPy pur d'un ensemble d'arbres exporté par compile_booster"""
+
+    def __init__(self, arrays):
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.left = arrays["left"]
+        self.right = arrays["right"]
+        self.missing = arrays["missing"]
+        self.value = arrays["value"]
+        self.roots = arrays["roots"]
+        self.max_depth = int(arrays["max_depth"])
+        self.base_score = np.float32(arrays["base_score"])
+        self.layout = {
+            key: arrays[key]
+            for key in ("n_columns", "numeric_src", "numeric_dst", "cat_src", "cat_code", "cat_dst")
+        }
+        self.feature_columns = [str(c) for c in arrays["feature_columns"]]
+        self.source_sha256 = str(arrays["source_sha256"])
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls({key: data[key] for key in data.files})
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def predict(self, features_matrix):
+        """Prédit pour une matrice N×15 (mêmes codes catégoriels que l'API)"""
+        encoded = encode_features(np.asarray(features_matrix, dtype=np.float64), self.layout)
+        return self.predict_encoded(encoded)
+
+    def predict_encoded(self, encoded):
+        """Prédit pour une matrice déjà encodée aux colonnes du booster"""
+        encoded = np.asarray(encoded, dtype=np.float32)
+        predictions = np.empty(encoded.shape[0], dtype=np.float32)
+        for start in range(0, encoded.shape[0], EVAL_CHUNK_ROWS):
+            chunk = encoded[start:start + EVAL_CHUNK_ROWS]
+            predictions[start:start + len(chunk)] = self._predict_chunk(chunk)
+        return predictions
+
+    def _predict_chunk(self, encoded):
+        # Un noeud courant par (ligne, arbre); chaque pas descend tous les arbres d'un niveau
+        rows = np.arange(encoded.shape[0])[:, None]
+        nodes = np.broadcast_to(self.roots, (encoded.shape[0], self.n_trees)).copy()
+        for _ in range(self.max_depth):
+            feature = self.feature[nodes]
+            x = encoded[rows, np.maximum(feature, 0)]
+            nodes = np.where(
+                np.isnan(x),
+                self.missing[nodes],
+                np.where(x < self.threshold[nodes], self.left[nodes], self.right[nodes])
+            )
+        return self.value[nodes].sum(axis=1, dtype=np.float32) + self.base_score
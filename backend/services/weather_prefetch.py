@@ -0,0 +1,121 @@
+# services/weather_prefetch.py
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from config.database import get_db_connection
+from config.mqtt_config import (
+    WEATHER_PREFETCH_ENABLED,
+    WEATHER_PREFETCH_INTERVAL_SECONDS,
+    WEATHER_PREFETCH_CONCURRENCY,
+    WEATHER_PREFETCH_MAX_LOCATIONS
+)
+from services.weather_service import weather_service, CITY_MAPPING
+from services.feature_service import location_key
+
+class WeatherPrefetcher:
+    """Rafraîchit la météo de toutes les localités des acteurs avant expiration du cache
+
+    Chaque cycle répartit les localités sur la première moitié de l'intervalle (pas de
+    rafale vers OpenWeather) avec au plus `concurrency` appels simultanés. Les résultats
+    passent par weather_service (cache + weather_logs): les routes ne lisent que le cache.
+    """
+
+    def __init__(self, enabled=WEATHER_PREFETCH_ENABLED, interval_seconds=WEATHER_PREFETCH_INTERVAL_SECONDS,
+                 concurrency=WEATHER_PREFETCH_CONCURRENCY, max_locations=WEATHER_PREFETCH_MAX_LOCATIONS):
+        self.enabled = enabled
+        self.interval_seconds = interval_seconds
+        self.concurrency = max(1, concurrency)
+        self.max_locations = max_locations
+        self._thread = None
+        self.locations = []
+        self.refreshed = 0
+        self.errors = 0
+        self.last_errors = 0
+        self.last_error = None
+        self.last_run = None
+        self.last_run_seconds = None
+
+    def start(self):
+        if not self.enabled or (self._thread and self._thread.is_alive()):
+            return
+        if not weather_service.api_key:
+            print("⚠️ Préchargement météo désactivé: pas de clé API OpenWeather")
+            return
+        self._thread = threading.Thread(target=self._run, name="weather-prefetch", daemon=True)
+        self._thread.start()
+        print(f"🌦️ Préchargement météo démarré (toutes les {self.interval_seconds:.0f}s, {self.concurrency} en parallèle)")
+
+    def _run(self):
+        while True:
+            started = time.monotonic()
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"❌ Erreur préchargement météo: {e}")
+            time.sleep(max(1.0, self.interval_seconds - (time.monotonic() - started)))
+
+    def load_locations(self):
+        """Localités distinctes des acteurs (plus celles du tableau de bord), une par ville API"""
+        conn = get_db_connection()
+        try:
+            rows = conn.execute('SELECT DISTINCT localite, region FROM actors').fetchall()
+        finally:
+            conn.close()
+
+        by_city = {}
+        for location in list(CITY_MAPPING) + [location_key(row) for row in rows]:
+            by_city.setdefault(weather_service.cache_key(location), location)
+        locations = list(by_city.values())
+        if len(locations) > self.max_locations:
+            print(f"⚠️ {len(locations)} localités, seules les {self.max_locations} premières sont préchargées")
+        return locations[:self.max_locations]
+
+    def run_once(self):
+        """Un cycle de préchargement; retourne le nombre de localités rafraîchies depuis l'API"""
+        started = time.perf_counter()
+        self.locations = self.load_locations()
+        spacing = self.interval_seconds / 2 / max(1, len(self.locations))
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="weather-prefetch") as pool:
+            futures = []
+            for index, location in enumerate(self.locations):
+                delay = started + index * spacing - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                futures.append(pool.submit(weather_service.refresh, location))
+
+        refreshed, failed = 0, 0
+        for location, future in zip(self.locations, futures):
+            try:
+                future.result()
+                refreshed += 1
+            except Exception as e:
+                # API en échec: la dernière donnée connue reste en cache
+                failed += 1
+                self.last_error = f"{location}: {e}"
+        if failed:
+            print(f"⚠️ Préchargement météo: {failed}/{len(self.locations)} localité(s) en échec ({self.last_error})")
+        self.refreshed += refreshed
+        self.errors += failed
+        self.last_errors = failed
+        self.last_run = datetime.now()
+        self.last_run_seconds = time.perf_counter() - started
+        return refreshed
+
+    def stats(self):
+        return {
+            "enabled": bool(self._thread and self._thread.is_alive()),
+            "interval_seconds": self.interval_seconds,
+            "concurrency": self.concurrency,
+            "locations": len(self.locations),
+            "refreshed": self.refreshed,
+            "errors": self.errors,
+            "last_run_errors": self.last_errors,
+            "last_error": self.last_error,
+            "last_run": self.last_run.strftime("%Y-%m-%d %H:%M:%S") if self.last_run else None,
+            "last_run_seconds": round(self.last_run_seconds, 3) if self.last_run_seconds is not None else None
+        }
+
+# Instance globale
+weather_prefetcher = WeatherPrefetcher()
@@ -1,33 +1,238 @@
 
-import requests
 import os
-from datetime import datetime
+import threading
+import time
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+import numpy as np
+from datetime import datetime, timezone
 from config.database import log_weather
+from config.mqtt_config import (
+    WEATHER_CACHE_TTL_SECONDS,
+    WEATHER_STALE_SECONDS,
+    WEATHER_SINGLEFLIGHT_TIMEOUT_SECONDS,
+    WEATHER_BATCH_CONCURRENCY,
+    WEATHER_HTTP_POOL_SIZE,
+    WEATHER_HTTP_TIMEOUT_SECONDS,
+    WEATHER_HTTP_RETRIES,
+    WEATHER_HTTP_BACKOFF_SECONDS,
+    WEATHER_BREAKER_THRESHOLD,
+    WEATHER_BREAKER_RESET_SECONDS,
+    OPENWEATHER_BASE_URL
+)
+from services.http_client import HttpClient, CircuitOpenError
+
+# Mapping des villes pour le Sénégal
+CITY_MAPPING = {
+    "thies": "Thiès,SN",
+    "taiba-ndiaye": "Taiba Ndiaye,SN"
+}
+
+# Noms affichés (et enregistrés dans weather_logs) par localité
+LOCATION_NAMES = {
+    "thies": "Thiès",
+    "taiba-ndiaye": "Taïba Ndiaye"
+}
+
+class WeatherUnavailableError(Exception):
+    """Appel OpenWeather en échec (HTTP, réseau, disjoncteur ouvert)"""
 
 class WeatherService:
     def __init__(self):
         self.api_key = os.getenv("OPENWEATHER_API_KEY")
-        self.base_url = "http://api.openweathermap.org/data/2.5/weather"
+        self.base_url = f"{OPENWEATHER_BASE_URL.rstrip('/')}/weather"
+        self.forecast_url = f"{OPENWEATHER_BASE_URL.rstrip('/')}/forecast"
+        self.http = HttpClient(
+            pool_size=WEATHER_HTTP_POOL_SIZE,
+            timeout=WEATHER_HTTP_TIMEOUT_SECONDS,
+            retries=WEATHER_HTTP_RETRIES,
+            backoff_seconds=WEATHER_HTTP_BACKOFF_SECONDS,
+            breaker_threshold=WEATHER_BREAKER_THRESHOLD,
+            breaker_reset_seconds=WEATHER_BREAKER_RESET_SECONDS
+        )
         self.last_update = None
+        self.cache_ttl = WEATHER_CACHE_TTL_SECONDS
+        self.stale_ttl = max(WEATHER_STALE_SECONDS, WEATHER_CACHE_TTL_SECONDS)
+        self._cache = {}           # localité -> {"data", "fetched_at"}
+        self._inflight = {}        # ville -> Future du rafraîchissement en cours
+        self._cache_lock = threading.Lock()
+        self.flight_timeout = WEATHER_SINGLEFLIGHT_TIMEOUT_SECONDS
+        self._batch_pool = ThreadPoolExecutor(max_workers=WEATHER_BATCH_CONCURRENCY, thread_name_prefix="weather-batch")
+        self.cache_counters = {"hit": 0, "stale": 0, "miss": 0, "fallback": 0, "coalesced": 0}
+    
+    def resolve_city(self, location):
+        """Nom de ville OpenWeather pour une localité"""
+        return CITY_MAPPING.get(location.lower(), location)
+    
+    def log_location_names(self, location):
+        """Valeurs possibles de weather_logs.location pour une localité (nom API ou nom affiché)"""
+        key = location.lower()
+        names = {location, self.resolve_city(location).split(",")[0]}
+        if key in LOCATION_NAMES:
+            names.add(LOCATION_NAMES[key])
+        return sorted(names)
+    
+    def cache_key(self, location):
+        """Clé de cache et de single-flight: ville OpenWeather normalisée"""
+        return self.resolve_city(location.strip()).lower()
     
     def get_weather_data(self, location):
-        """Récupère les données météo pour une ville donnée"""
+        """Récupère les données météo pour une ville donnée
+        
+        Réponses gardées WEATHER_CACHE_TTL_SECONDS par localité. Au-delà, et jusqu'à
+        WEATHER_STALE_SECONDS, la donnée périmée est servie tout de suite pendant qu'un
+        seul rafraîchissement tourne en arrière-plan. Les appels API et les lignes
+        weather_logs dépendent du nombre de localités, plus du nombre de visiteurs.
+        """
+        key = self.cache_key(location)
+        with self._cache_lock:
+            entry = self._cache.get(key)
+        
+        if entry:
+            age = time.monotonic() - entry["fetched_at"]
+            if age < self.cache_ttl:
+                return self._with_cache_meta(entry, "hit", age)
+            if age < self.stale_ttl:
+                self._refresh_in_background(key, location)
+                return self._with_cache_meta(entry, "stale", age)
+        
+        entry, status = self._refresh(key, location)
+        return self._with_cache_meta(entry, status, time.monotonic() - entry["fetched_at"])
+    
+    def get_weather_batch(self, locations):
+        """Météo de plusieurs localités: entrées en cache servies directement, les autres en parallèle
+        
+        Retourne (résultats, erreurs) indexés par localité demandée; la latence est celle
+        de l'appel manquant le plus lent, pas leur somme.
+        """
+        results, errors, pending = {}, {}, {}
+        now = time.monotonic()
+        for location in dict.fromkeys(locations):
+            with self._cache_lock:
+                entry = self._cache.get(self.cache_key(location))
+            if entry and now - entry["fetched_at"] < self.stale_ttl:
+                results[location] = self.get_weather_data(location)
+            else:
+                pending[location] = self._batch_pool.submit(self.get_weather_data, location)
+        
+        for location, future in pending.items():
+            try:
+                results[location] = future.result()
+            except Exception as e:
+                print(f"❌ Erreur météo {location}: {e}")
+                errors[location] = str(e)
+        return results, errors
+    
+    def refresh(self, location):
+        """Force un appel API pour une localité (préchargement), en partageant un appel déjà en cours
+        
+        Lève WeatherUnavailableError si l'API est en échec (l'entrée en cache est gardée).
+        """
+        return self._await_flight(self.cache_key(location), location)["data"]
+    
+    def _flight(self, key):
+        """Rafraîchissement en cours pour une ville; (future, True) si l'appelant doit le faire"""
+        with self._cache_lock:
+            future = self._inflight.get(key)
+            if future:
+                self.cache_counters["coalesced"] += 1
+                return future, False
+            future = Future()
+            self._inflight[key] = future
+            return future, True
+    
+    def _run_flight(self, key, location, future):
+        """Un seul appel API (et une seule ligne weather_logs) par rafraîchissement
+        
+        Seules les réponses de l'API sont mises en cache: en cas d'échec l'entrée
+        existante est gardée telle quelle (WeatherUnavailableError pour les appelants).
+        """
+        try:
+            entry = {"data": self._fetch_weather_data(location), "fetched_at": time.monotonic()}
+            with self._cache_lock:
+                self._cache[key] = entry
+            future.set_result(entry)
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with self._cache_lock:
+                self._inflight.pop(key, None)
+    
+    def _await_flight(self, key, location):
+        """Entrée rafraîchie; lève WeatherUnavailableError ou FuturesTimeoutError en cas d'échec"""
+        future, leader = self._flight(key)
+        if leader:
+            self._run_flight(key, location, future)
+        return future.result(timeout=self.flight_timeout)
+    
+    def _refresh(self, key, location):
+        """(entrée, statut): donnée fraîche, sinon dernière donnée connue, sinon données de secours"""
+        try:
+            return self._await_flight(key, location), "miss"
+        except FuturesTimeoutError:
+            print(f"⚠️ Attente météo {location} dépassée")
+        except WeatherUnavailableError:
+            pass  # Déjà signalé par _fetch_weather_data
+        
+        with self._cache_lock:
+            entry = self._cache.get(key)
+        if entry:
+            return entry, "stale"
+        # Données simulées: jamais mises en cache, le prochain appel retentera l'API
+        return {"data": self._get_fallback_data(location), "fetched_at": time.monotonic()}, "fallback"
+    
+    def _refresh_in_background(self, key, location):
+        future, leader = self._flight(key)
+        if not leader:
+            return
+        
+        def refresh():
+            self._run_flight(key, location, future)
+            if future.exception():
+                print(f"❌ Erreur rafraîchissement météo {location}: {future.exception()}")
+        
+        threading.Thread(target=refresh, name=f"weather-refresh-{key}", daemon=True).start()
+    
+    def _with_cache_meta(self, entry, status, age):
+        """Copie de la donnée en cache (les routes peuvent la modifier) avec ses métadonnées"""
+        with self._cache_lock:
+            self.cache_counters[status] += 1
+        data = dict(entry["data"])
+        data["cache"] = {
+            "status": status,
+            "age_seconds": round(age, 1),
+            "ttl_seconds": self.cache_ttl
+        }
+        return data
+    
+    def cache_stats(self):
+        with self._cache_lock:
+            now = time.monotonic()
+            return {
+                "ttl_seconds": self.cache_ttl,
+                "stale_seconds": self.stale_ttl,
+                "locations": {key: round(now - entry["fetched_at"], 1) for key, entry in self._cache.items()},
+                "refreshing": sorted(self._inflight),
+                **self.cache_counters
+            }
+    
+    def _fetch_weather_data(self, location):
+        """Appel OpenWeather pour une ville donnée (données de secours sans clé API)
+        
+        Lève WeatherUnavailableError si l'API ne répond pas correctement.
+        """
         if not self.api_key:
             print("⚠️ Pas de clé API OpenWeather, utilisation données de secours")
             return self._get_fallback_data(location)
         
-        # Mapping des villes pour le Sénégal
-        city_mapping = {
-            "thies": "Thiès,SN",
-            "taiba-ndiaye": "Taiba Ndiaye,SN"
-        }
-        
-        city = city_mapping.get(location.lower(), location)
+        city = self.resolve_city(location)
         
         try:
-            url = f"{self.base_url}?q={city}&appid={self.api_key}&units=metric&lang=fr"
-            print(f"🌍 Appel API météo: {url}")
-            response = requests.get(url, timeout=10)
+            print(f"🌍 Appel API météo: {city}")
+            response = self.http.get(
+                self.base_url,
+                params={"q": city, "appid": self.api_key, "units": "metric", "lang": "fr"}
+            )
             
             if response.status_code == 200:
                 data = response.json()
@@ -47,11 +252,99 @@ class WeatherService:
                 return weather_data
             else:
                 print(f"⚠️ API Météo error {response.status_code}: {response.text}")
-                return self._get_fallback_data(location)
+                raise WeatherUnavailableError(f"API météo: HTTP {response.status_code}")
                 
+        except WeatherUnavailableError:
+            raise
+        except CircuitOpenError as e:
+            raise WeatherUnavailableError(str(e)) from e  # Échec immédiat, API indisponible
         except Exception as e:
             print(f"❌ Erreur météo API: {e}")
-            return self._get_fallback_data(location)
+            raise WeatherUnavailableError(str(e)) from e
+    
+    def get_weather_features(self, location):
+        """Météo courante sous forme numérique, par index de feature du modèle ML"""
+        weather_data = self.get_weather_data(location)
+        return {
+            0: float(weather_data['temperature'].replace('°C', '')),        # Température_air_(°C)
+            1: float(weather_data['precipitation'].replace(' mm', '')),     # Précipitation_(mm)
+            2: float(weather_data['humidity'].replace('%', '')),            # Humidité_air_(%)
+            3: float(weather_data['windSpeed'].split()[0])                  # Vent_moyen_(km/h)
+        }
+    
+    def get_hourly_forecast(self, location, hours=72):
+        """Prévisions horaires sur `hours` heures à partir de la prochaine heure pleine (UTC)
+        
+        OpenWeather fournit des pas de 3h: les valeurs sont interpolées heure par heure.
+        Retourne des tableaux NumPy alignés sur "times" (timestamps Unix).
+        """
+        now = int(datetime.now(timezone.utc).timestamp())
+        times = (now // 3600 + 1) * 3600 + 3600 * np.arange(hours, dtype=np.int64)
+        
+        if not self.api_key:
+            return self._get_fallback_forecast(location, times)
+        
+        city = self.resolve_city(location)
+        try:
+            response = self.http.get(
+                self.forecast_url,
+                params={"q": city, "appid": self.api_key, "units": "metric"}
+            )
+            if response.status_code != 200:
+                print(f"⚠️ API Prévisions error {response.status_code}: {response.text}")
+                return self._get_fallback_forecast(location, times)
+            
+            steps = response.json()["list"]
+            step_times = np.array([step["dt"] for step in steps], dtype=np.float64)
+            
+            def serie(values):
+                return np.interp(times, step_times, np.array(values, dtype=np.float64))
+            
+            print(f"✅ Prévisions horaires API récupérées pour {city}")
+            return {
+                "location": location,
+                "source": "api",
+                "times": times,
+                "temperature": serie([step["main"]["temp"] for step in steps]),
+                "humidity": serie([step["main"]["humidity"] for step in steps]),
+                "wind_speed": serie([step["wind"]["speed"] * 3.6 for step in steps]),
+                # Cumul sur 3h ramené à l'heure
+                "precipitation": serie([
+                    (step.get("rain", {}).get("3h", 0) + step.get("snow", {}).get("3h", 0)) / 3
+                    for step in steps
+                ])
+            }
+        except Exception as e:
+            print(f"❌ Erreur prévisions API: {e}")
+            return self._get_fallback_forecast(location, times)
+    
+    def _get_fallback_forecast(self, location, times):
+        """Prévisions de secours: cycle journalier selon la saison, stable pour une même journée"""
+        seed = zlib.crc32(f"{location.lower()}-{datetime.now().date()}".encode())
+        rng = np.random.default_rng(seed)
+        month = datetime.now().month
+        is_dry_season = month in [11, 12, 1, 2, 3, 4, 5]  # Nov-Mai
+        
+        # Heure locale (Sénégal = UTC): maximum de température vers 15h
+        hour_angle = 2 * np.pi * ((times // 3600) % 24 - 15) / 24
+        if is_dry_season:
+            temperature = 30 + 5 * np.cos(hour_angle)
+            humidity = 52 - 12 * np.cos(hour_angle)
+            precipitation = np.zeros(len(times))
+        else:  # Saison des pluies
+            temperature = 26 + 4 * np.cos(hour_angle)
+            humidity = 80 - 10 * np.cos(hour_angle)
+            precipitation = np.where(rng.random(len(times)) < 0.15, rng.uniform(1, 8, len(times)), 0.0)
+        
+        return {
+            "location": location,
+            "source": "fallback",
+            "times": times,
+            "temperature": temperature + rng.normal(0, 0.5, len(times)),
+            "humidity": np.clip(humidity + rng.normal(0, 2, len(times)), 10, 100),
+            "wind_speed": np.clip(13 + 5 * np.sin(hour_angle) + rng.normal(0, 1, len(times)), 0, None),
+            "precipitation": precipitation
+        }
     
     def get_last_update_time(self):
         """Retourne l'heure de la dernière mise à jour"""
@@ -97,11 +390,6 @@ class WeatherService:
     
     def _get_fallback_data(self, location):
         """Données de secours optimisées pour Thiès/Taïba Ndiaye"""
-        location_names = {
-            "thies": "Thiès",
-            "taiba-ndiaye": "Taïba Ndiaye"
-        }
-        
         # Données réalistes pour la région de Thiès
         import random
         from datetime import datetime
@@ -125,7 +413,7 @@ class WeatherService:
             "windSpeed": f"{random.randint(8, 18)} km/h",
             "precipitation": f"{precipitation} mm",
             "weatherIcon": "rain" if precipitation > 5 else "sun",
-            "location": location_names.get(location, location.title()),
+            "location": LOCATION_NAMES.get(location, location.title()),
             "description": "Données locales simulées",
             "pressure": f"{random.randint(1010, 1020)} hPa",
             "feels_like": f"{temp + random.randint(-2, 4)}°C"
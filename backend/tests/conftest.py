@@ -0,0 +1,18 @@
+# tests/conftest.py
+import os
+import sys
+import pytest
+
+# Mêmes conditions que start.py: imports depuis backend/, modèles relatifs à backend/
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(BACKEND_DIR)
+
+@pytest.fixture
+def temp_database(tmp_path, monkeypatch):
+    """Base SQLite jetable (le pool se reconstruit quand DATABASE_PATH change)"""
+    from config import database
+    monkeypatch.setattr(database, "DATABASE_PATH", tmp_path / "irrigation_logs.db")
+    database.init_db()
+    yield database.DATABASE_PATH
+    database.log_writer.flush(5)
@@ -0,0 +1,47 @@
+# tests/test_tree_engine_parity.py
+"""Le modèle compilé (.npz) versionné doit rester identique au pipeline XGBoost (.pkl)"""
+import os
+import numpy as np
+import pytest
+
+joblib = pytest.importorskip("joblib")
+pytest.importorskip("xgboost")
+
+from export_model import TOLERANCE_M3, check_parity, parity_matrix, threshold_rows
+from services.ml_service import build_booster_layout, ml_service
+from services.tree_engine import CompiledTreeModel, file_sha256
+
+MODEL_PATH = os.path.join("models", "xgboost_arrosage_litres.pkl")
+COMPILED_PATH = os.path.splitext(MODEL_PATH)[0] + ".npz"
+
+@pytest.fixture(scope="module")
+def artifacts():
+    if not (os.path.exists(MODEL_PATH) and os.path.exists(COMPILED_PATH)):
+        pytest.skip("Modèles .pkl/.npz absents")
+    model = joblib.load(MODEL_PATH)
+    return model, CompiledTreeModel.load(COMPILED_PATH)
+
+def test_compiled_model_matches_source_checksum(artifacts):
+    _, compiled = artifacts
+    source_sha256 = file_sha256(MODEL_PATH)
+    assert compiled.source_sha256 == source_sha256, "Modèle .npz périmé: relancer python export_model.py"
+    assert ml_service.get_model_info()["version"] == source_sha256[:12]
+
+def test_compiled_model_layout_matches_pipeline(artifacts):
+    model, compiled = artifacts
+    layout = build_booster_layout(model)
+    for key, values in compiled.layout.items():
+        assert np.array_equal(np.asarray(layout[key]), values), key
+
+def test_parity_on_random_rows(artifacts):
+    model, compiled = artifacts
+    matrix = parity_matrix(build_booster_layout(model), rows=5000, seed=7)
+    assert check_parity(model, compiled, matrix) <= TOLERANCE_M3
+
+def test_parity_on_threshold_edges(artifacts):
+    model, compiled = artifacts
+    base_rows = parity_matrix(build_booster_layout(model), rows=3, seed=11)
+    for base_row in base_rows:
+        edges = threshold_rows(compiled, base_row)
+        assert len(edges)
+        assert check_parity(model, compiled, edges) <= TOLERANCE_M3
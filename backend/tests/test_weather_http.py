@@ -0,0 +1,201 @@
+# tests/test_weather_http.py
+"""Client HTTP météo (retries, disjoncteur) contre un serveur OpenWeather local"""
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import requests
+from services.http_client import HttpClient, CircuitOpenError
+
+WEATHER_PAYLOAD = {
+    "main": {"temp": 31, "humidity": 40, "pressure": 1010, "feels_like": 33},
+    "wind": {"speed": 3},
+    "weather": [{"description": "clair", "icon": "01d"}],
+    "name": "Thiès"
+}
+
+class StubOpenWeather:
+    """Serveur local: réponses jouées dans l'ordre de `script`, puis `default`"""
+
+    def __init__(self):
+        self.script = []
+        self.default = "ok"
+        self.hits = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                stub.hits += 1
+                action = stub.script.pop(0) if stub.script else stub.default
+                if action == "slow":
+                    time.sleep(0.5)
+                    action = "ok"
+                status, body = (200, json.dumps(WEATHER_PAYLOAD).encode()) if action == "ok" else (int(action), b"erreur")
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except OSError:
+                    pass  # Client parti après son timeout
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+@pytest.fixture
+def stub():
+    server = StubOpenWeather()
+    yield server
+    server.close()
+
+def make_client(**overrides):
+    options = dict(timeout=0.2, connect_timeout=0.2, retries=2, backoff_seconds=0.01,
+                   breaker_threshold=3, breaker_reset_seconds=0.3)
+    options.update(overrides)
+    return HttpClient(**options)
+
+def closed_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def test_5xx_is_retried_until_success(stub):
+    stub.script = ["503", "502", "ok"]
+    client = make_client()
+    response = client.get(stub.url + "/weather")
+    assert response.status_code == 200
+    assert stub.hits == 3
+    assert client.stats()["retried"] == 2
+    assert client.breaker.state == "closed"
+
+def test_connect_error_is_retried():
+    client = make_client()
+    with pytest.raises(requests.ConnectionError):
+        client.get(f"http://127.0.0.1:{closed_port()}/weather")
+    stats = client.stats()
+    assert stats["requests"] == 3
+    assert stats["retried"] == 2
+    assert stats["breaker"]["consecutive_failures"] == 1
+
+def test_read_timeout_is_not_retried(stub):
+    stub.default = "slow"
+    client = make_client()
+    with pytest.raises(requests.ReadTimeout):
+        client.get(stub.url + "/weather")
+    assert stub.hits == 1
+    assert client.stats()["retried"] == 0
+
+def test_4xx_is_returned_without_retry(stub):
+    stub.default = "404"
+    client = make_client()
+    assert client.get(stub.url + "/weather").status_code == 404
+    assert stub.hits == 1
+    assert client.breaker.state == "closed"
+
+def test_breaker_opens_after_threshold_and_blocks_upstream(stub):
+    stub.default = "503"
+    client = make_client(retries=0, breaker_threshold=2, breaker_reset_seconds=60)
+    for _ in range(2):
+        with pytest.raises(requests.HTTPError):
+            client.get(stub.url + "/weather")
+    assert client.breaker.state == "open"
+
+    for _ in range(5):
+        with pytest.raises(CircuitOpenError):
+            client.get(stub.url + "/weather")
+    assert stub.hits == 2
+    assert client.breaker.stats()["rejected"] == 5
+
+def test_half_open_probe_failure_reopens(stub):
+    stub.default = "503"
+    client = make_client(retries=0, breaker_threshold=1, breaker_reset_seconds=0.2)
+    with pytest.raises(requests.HTTPError):
+        client.get(stub.url + "/weather")
+    time.sleep(0.25)
+
+    with pytest.raises(requests.HTTPError):
+        client.get(stub.url + "/weather")  # Appel d'essai
+    assert stub.hits == 2
+    assert client.breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        client.get(stub.url + "/weather")
+    assert client.breaker.stats()["opened_count"] == 2
+
+def test_half_open_probe_success_closes(stub):
+    stub.default = "503"
+    client = make_client(retries=0, breaker_threshold=1, breaker_reset_seconds=0.2)
+    with pytest.raises(requests.HTTPError):
+        client.get(stub.url + "/weather")
+    stub.default = "ok"
+    with pytest.raises(CircuitOpenError):
+        client.get(stub.url + "/weather")
+    time.sleep(0.25)
+
+    assert client.get(stub.url + "/weather").status_code == 200
+    assert client.breaker.state == "closed"
+    assert client.breaker.failures == 0
+    assert client.get(stub.url + "/weather").status_code == 200
+    assert stub.hits == 3
+
+def test_base_url_comes_from_config(stub):
+    code = "from services.weather_service import weather_service as w; print(w.base_url); print(w.forecast_url)"
+    env = dict(os.environ, OPENWEATHER_BASE_URL=stub.url + "/data/2.5/")
+    output = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True).stdout
+    assert f"{stub.url}/data/2.5/weather" in output.splitlines()
+    assert f"{stub.url}/data/2.5/forecast" in output.splitlines()
+
+@pytest.fixture
+def app_client(stub, temp_database, monkeypatch):
+    """Application Flask sans MQTT ni threads de fond, météo pointée sur le serveur local"""
+    import app as app_module
+    from services import weather_service as weather_module
+    from services.mqtt_service import mqtt_service
+    for service, method in ((mqtt_service, "connect"), (app_module.forecast_engine, "start"),
+                            (app_module.log_retention, "start"), (app_module.weather_prefetcher, "start"),
+                            (app_module.ml_service, "start_model_watcher")):
+        monkeypatch.setattr(service, method, lambda: None)
+
+    service = weather_module.WeatherService()
+    service.api_key = "test"
+    service.base_url = stub.url + "/weather"
+    service.http = make_client(retries=0, breaker_threshold=2, breaker_reset_seconds=60)
+    service.cache_ttl = service.stale_ttl = 0  # Chaque requête interroge l'API
+    monkeypatch.setattr(app_module, "weather_service", service)
+    monkeypatch.setattr("routes.weather.weather_service", service)
+    return app_module.create_app().test_client()
+
+def test_health_reports_breaker_state(stub, app_client):
+    assert app_client.get("/api/weather/thies").get_json()["temperature"] == "31°C"
+    health = app_client.get("/api/health").get_json()
+    assert health["weather_api"]["breaker"]["state"] == "closed"
+
+    stub.default = "503"
+    for _ in range(2):
+        # API en échec: la dernière lecture réelle est servie, jamais remplacée par la simulation
+        data = app_client.get("/api/weather/thies").get_json()
+        assert data["cache"]["status"] == "stale"
+        assert data["temperature"] == "31°C"
+    health = app_client.get("/api/health").get_json()
+    assert health["weather_api"]["breaker"]["state"] == "open"
+    assert health["weather_api"]["breaker"]["consecutive_failures"] == 2
+
+    hits = stub.hits
+    assert app_client.get("/api/weather/thies").get_json()["cache"]["status"] == "stale"
+    assert stub.hits == hits
+    assert app_client.get("/api/health").get_json()["weather_api"]["breaker"]["rejected"] == 1